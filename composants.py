@@ -1250,6 +1250,32 @@ class Preferences(FenetreTierce) :
                               False))
         sansAdj.grid(row=1, column=2, padx=5, sticky=tk.W)
 
+        ################
+        # Stratégies de l'ia, prises en compte à la partie suivante
+        self.labelStrategies = LabelIntitule(self, var='preference_strategie',
+                                             font=self.policeLabel)
+        self.labelStrategies.grid(row=10, column=1, padx=10, sticky=tk.E)
+        self.rowconfigure(10, weight=2)
+
+        self.labelStrategiesDesc = LabelDescription(self, self.largeurLabelDesc,
+                                                    2, self.policeDesc)
+        self.labelStrategiesDesc.grid(row=11, column=1, columnspan=2)
+        self.rowconfigure(11, weight=1)
+
+        lstrategies, lstrategiesDesc = {}, {}
+        import ia
+
+        for c in ia.STRATEGIES :
+            lstrategies[c] = 'strategie_{}_nom'.format(c)
+            lstrategiesDesc[c] = 'strategie_{}_description'.format(c)
+
+        ldStrategies = ListeDeroulanteInfo(self, 'strategie', lstrategies,
+                                           config.utilisateur.strategie,
+                                           self.enregistrer,
+                                           self.labelStrategiesDesc,
+                                           lstrategiesDesc, var=True)
+        ldStrategies.ancrer(row=10, column=2, padx=10, sticky=tk.W)
+
         '''
         ################
         # Abandon de l'idée d'ajouter du son au jeu, même si il est aisé
@@ -1279,8 +1305,8 @@ class Preferences(FenetreTierce) :
         # Fermeture
         self.boutonFermer = Bouton(self, var='bouton_fermer',
                                    command=self.destroy)
-        self.boutonFermer.grid(row=11, column=1, columnspan=2)
-        self.rowconfigure(11, weight=3)
+        self.boutonFermer.grid(row=12, column=1, columnspan=2)
+        self.rowconfigure(12, weight=3)
 
 
     def enregistrer(self, id_, valeur) :
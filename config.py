@@ -7,6 +7,9 @@ Modules des variables de configuration de l'application
 PARAMETRES_LOGGING =\
 {
     'version': 1,
+    # Les loggers de modules (disposition) créés avant la configuration
+    # doivent rester actifs
+    'disable_existing_loggers': False,
     'formatters': 
     {
         'INFO':
@@ -79,7 +82,13 @@ PARAMETRES_LOGGING =\
         {
             'level': 'DEBUG',
             'handlers': ['fichier_debug', 'terminal_debug',],
-        }
+        },
+        'disposition':
+        {
+            'level': 'WARNING',
+            'handlers': ['fichier_info', 'terminal_info',],
+            'propagate': False,
+        },
     }
 }
 
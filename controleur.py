@@ -11,7 +11,8 @@ from composants import (CompteurBateauxPlateau, GrillePlateau,
                         MarqueurTirPlateau, MarqueurTourPlateau,
                         MessagePlateau, CasesGrillePlateau)
 import methodes
-from libs import CasesGrille, genChaine, MessageResultatTir
+from libs import CasesGrille, genChaine, MessageResultatTir, carteFlottes,\
+                 livreOuvertures
 from ia import IA
 
 
@@ -96,28 +97,60 @@ class JoueurHumain(Joueur) :
 class JoueurVirtuel(Joueur) :
 
     def __init__(self, id_, casesBateaux, retourTir, cg, bateauxAdjacents,
-                 delai=2) :
+                 delai=2, strategie='zones') :
+        '''
+        @param strategie : stratégie de tirage de l'ia (voir ia.STRATEGIES)
+        '''
         Joueur.__init__(self, id_, casesBateaux, retourTir)
         self.cg = cg
         self.bateauxAdjacents = bateauxAdjacents
         self.delai = delai
-        self.ia = IA(config.nombreCases, config.bateaux, self.bateauxAdjacents)
+        self.ia = IA(config.nombreCases, config.bateaux, self.bateauxAdjacents,
+                     strategie, carte=carteFlottes(config.idJeu,
+                                                   config.nombreCases,
+                                                   self.bateauxAdjacents),
+                     livre=livreOuvertures(config.idJeu, config.nombreCases,
+                                           self.bateauxAdjacents))
         self.tir = 0
+        self._anticipation = None
 
-    def _attendre(self) :
+    def _attendre(self, echeance) :
         ''' Méthode interne '''
-        i, tour = 0, self.delai * 10
-        while i < tour :
-            sleep(0.1)
+        ''' Attend jusqu'à l'échéance fournie (time()) '''
+        while time() < echeance :
+            sleep(min(0.1, max(0, echeance - time())))
             # Test à chaque tour de l'état du jeu, ceci afin de permettre un
             # arrêt rapide, si arrêt du jeu en cours effectué dans cette boucle.
             if not self.actif :
                 break
-            i += 1
+
+    def anticiper(self) :
+        '''
+        Lance en arrière plan le calcul du prochain tir de l'ia, à appeler au
+        début du tour adverse, qui ne modifie pas l'état connu de l'ia.
+        '''
+        self.finirAnticipation()
+        self._anticipation = threading.Thread(target=self.ia.anticiper,
+                                              args=(time() + self.delai,),
+                                              daemon=True)
+        self._anticipation.start()
+
+    def finirAnticipation(self) :
+        ''' Attend la fin du calcul anticipé du tir s'il y en a un en cours '''
+        if self._anticipation is not None :
+            self._anticipation.join()
+            self._anticipation = None
 
     def tirer(self) :
-        self._attendre()
-        self.tir = self.ia.tirer()
+        # Le délai du tour sert de temps de calcul à l'ia (nul si le tir a pu
+        # être anticipé), seul le reliquat est attendu. L'échéance est fixée
+        # avant d'attendre l'anticipation : lancée plus tôt avec le même délai,
+        # celle-ci se termine avant elle, et le tour ne dure pas plus que le
+        # délai.
+        echeance = time() + self.delai
+        self.finirAnticipation()
+        self.tir = self.ia.tirer(echeance)
+        self._attendre(echeance)
         self.retourTir(self.id, self.tir)
 
     def resultatTir(self, resultat) :
@@ -138,7 +171,7 @@ class ControleurJeu(threading.Thread) :
     effectuées.
     '''
     def __init__(self, plateau, bateauxJoueurHumain, bateauxJoueurVirtuel,
-                 bateauxAdjacents, retourResultats) :
+                 bateauxAdjacents, retourResultats, strategieIA='zones') :
 
         self.plateau = plateau
         self.retourResultats = retourResultats
@@ -207,7 +240,8 @@ class ControleurJeu(threading.Thread) :
                               nom=config.nomAdversaire,
                               joueur=JoueurVirtuel(tmpId, bateauxJoueurVirtuel,
                                                    self.traitementTir,
-                                                   cgv, self.bateauxAdjacents),
+                                                   cgv, self.bateauxAdjacents,
+                                                   strategie=strategieIA),
                               bateaux=bateauxJoueurVirtuel,
                               grille=gv,
                               tir=MarqueurTirPlateau(self.plateau),
@@ -263,8 +297,10 @@ class ControleurJeu(threading.Thread) :
     def activerBind(self) :
         '''
         Substitut de la méthode tirer joueur.
-        Activation du bind pour que le joueur humain puisse jouer.
+        Activation du bind pour que le joueur humain puisse jouer, l'ia
+        anticipant son prochain tir pendant ce temps.
         '''
+        self.virtuel.joueur.anticiper()
         self.methodeTir.activer()
 
     def validerTir(self, event) :
@@ -405,6 +441,7 @@ class ControleurJeu(threading.Thread) :
         self.tourFini = True
 
     def run(self) :
+        virtuel = self.virtuel.joueur
         while not self._arretJeu.isSet() :
             if not self.initJeu :
                 try :
@@ -425,6 +462,8 @@ class ControleurJeu(threading.Thread) :
                         self._arretJeu.set()
                         break
 
+        virtuel.finirAnticipation()
+        virtuel.ia.terminer()
         self._arretEffectif.set()
         config.methodeTir = None
         if self._retournerResultats :
@@ -1,12 +1,25 @@
 #Disposition
 
-from random import choice
-
+import os
+import sys
+import mmap
+import struct
+import queue
+import threading
+import multiprocessing
+import logging
+from array import array
 import config
 import composants
-from libs import CasesGrille, bornesGrille
+from libs import CasesGrille, casesMasque, deriverGraine, obtenirHasard,\
+                 obtenirPool, tablesPlacements, topologieGrille
 
 HORIZONTAL, VERTICAL = 0, 1
+# Côté maximum des grilles dont les flottes sont tirées sur les masques de la
+# grille entière plutôt que sur les masques par ligne
+LIMITE_FENETRES = 32
+
+journal = logging.getLogger(__name__)
 
 class DispositionManuelle :
     '''
@@ -50,6 +63,7 @@ class DispositionManuelle :
         self.flotte = composants.FlottePlateau(self.plateau)
         self.cg = CasesGrille(config.margeGrille, config.margeGrille,
                               config.nombreCases, config.tailleCases)
+        self.tables = tablesPlacements(config.nombreCases, config.bateaux)
 
     def curseur(self, evt) :
         oids = self.plateau.find_overlapping(evt.x, evt.y, evt.x, evt.y)
@@ -64,8 +78,10 @@ class DispositionManuelle :
         '''
         Positionne aléatoirement les bateaux sur la grille
         '''
-        da = DispositionAleatoire(self.bateauxAdjacents)
-        for index, cases in da.positionner().items() :
+        flotte = reserveFlottes(config.idJeu, config.nombreCases,
+                                config.bateaux, self.bateauxAdjacents)\
+                 .prendre()
+        for index, cases in flotte.items() :
             self.bateauxPlaces[self.flotte.idIndex(index)] = cases
             self.flotte.bateau(self.flotte.idIndex(index))\
                                 .deplacerSur(*self.cg.coords(*cases))
@@ -126,47 +142,29 @@ class DispositionManuelle :
             destinationBonne = True
             # Vérification que l'on peut le déposer sur un endroit autorisé.
             case = self.cg.point(event.x, event.y)
+            taille = self.flotte.bateau(self.bateauId).taille
+            index = None
             if case :
-                cases = [case]
-                if self.orientationBateau == HORIZONTAL :
-                    bornes = bornesGrille(case, config.nombreCases)
-                    for n in range(case + 1,
-                                   case\
-                                   + self.flotte.bateau(self.bateauId).taille) :
-                        if n <= bornes[1] :
-                            cases.append(n)
-                        else :
-                            destinationBonne = False
-                            break
-                else :
-                    for n in range(case + config.nombreCases,
-                       case + (self.flotte.bateau(self.bateauId).taille - 1)\
-                       * config.nombreCases + 1, config.nombreCases) :
-                        if n <= config.nombreCases ** 2 :
-                            cases.append(n)
-                        else :
-                            destinationBonne = False
-                            break
-            else :
+                index = self.tables.index(case, self.orientationBateau, taille)
+            if index is None :
                 destinationBonne = False
+            else :
+                masque = self.tables.masques(taille)[index]
+                cases = casesMasque(masque)
+                occupees = 0
+                for casesBateaux in self.bateauxPlaces.values() :
+                    for c in casesBateaux :
+                        occupees |= 1 << (c - 1)
 
-            if destinationBonne and self.bateauxPlaces :
-                for c, v in self.bateauxPlaces.items() :
-                    if set(cases) & set(v) :
-                        destinationBonne = False
-                        self.message('message_disposition_superposition',
-                                     'attention')
-                        break
+            if destinationBonne and masque & occupees :
+                destinationBonne = False
+                self.message('message_disposition_superposition', 'attention')
 
-            if destinationBonne and self.bateauxPlaces\
-               and not self.bateauxAdjacents :
+            if destinationBonne and not self.bateauxAdjacents\
+               and self.tables.halos(taille)[index] & occupees :
                 # Les bateaux ne sont pas autorisés à être juxtaposés
-                adj = set(self.cg.adjacentes(*cases))
-                for casesBateaux in self.bateauxPlaces.values() :
-                    if adj & set(casesBateaux) :
-                        self.message('message_disposition_contigu', 'attention')
-                        destinationBonne = False
-                        break
+                self.message('message_disposition_contigu', 'attention')
+                destinationBonne = False
 
             if destinationBonne :
                 self.flotte.bateau(self.bateauId)\
@@ -226,106 +224,396 @@ class DispositionManuelle :
 
 
 class DispositionAleatoire :
-    def __init__(self, bateauxAdjacents) :
+    '''
+    Positionnement aléatoire des bateaux d'une grille.
+    Les cases encore disponibles sont tenues dans un masque par ligne (bit i à 1
+    si la i-ème case de la ligne peut recevoir un bateau).
+
+    Par défaut, la flotte est tirée uniformément parmi toutes les flottes
+    légales : chaque bateau est tiré uniformément parmi tous les positionnements
+    de sa taille, la flotte étant entièrement retirée dès qu'un bateau ne peut
+    être placé (rejet). Toutes les flottes légales sont ainsi également
+    probables, mais les essais nécessaires croissent avec la densité de la
+    flotte (voir essais). Le rejet remplace un tirage par dénombrement des
+    flottes (retour arrière compté), dont les sous-problèmes à mémoriser
+    (cases occupées, bateaux restants) sont trop nombreux hors des très petites
+    grilles.
+    Au-delà d'un nombre d'essais, le tirage uniforme échoue : RuntimeError est
+    levée, ou à défaut (repli) un avertissement est journalisé et, comme si
+    uniforme est False, chaque bateau est placé sur l'un de ses positionnements
+    encore possibles, obtenus par opérations binaires sur les lignes ; si un
+    bateau ne peut être placé, le précédent est déplacé (retour arrière local)
+    plutôt que de recommencer toute la flotte. Les flottes ne sont alors plus
+    tout à fait équiprobables (voir equiprobable).
+    '''
+    def __init__(self, bateauxAdjacents, hasard=None, nbCases=None,
+                 bateaux=None, uniforme=True, maxEssais=20000, repli=True) :
+        '''
+        @param bateauxAdjacents : booléen spécifiant si les bateaux peuvent être
+                                  juxtaposés les uns aux autres
+        @param hasard           : générateur aléatoire ou graine (voir
+                                  libs.obtenirHasard)
+        @param nbCases          : nombre de cases du côté de la grille,
+                                  config.nombreCases par défaut
+        @param bateaux          : liste des tailles de bateaux, config.bateaux
+                                  par défaut
+        @param uniforme         : tirage uniforme des flottes par rejet
+        @param maxEssais        : nombre maximum d'essais du tirage uniforme
+        @param repli            : si False, RuntimeError est levée lorsque le
+                                  tirage uniforme échoue, plutôt que de placer
+                                  les bateaux avec retour arrière
+        '''
         self.bateauxAdjacents = bateauxAdjacents
-        self.totalCases = config.nombreCases ** 2
-        self._nbTentative = 0
-        self._nbMaxTentative = 100
-
-    def _selectionnerPositions(self, casesDisponibles, tailleBateau) :
-        ''' Méthode interne récursive '''
-        try :
-            n = choice(casesDisponibles)
-        except IndexError :
+        self._hasard = obtenirHasard(hasard)
+        self.nbCases = config.nombreCases if nbCases is None else nbCases
+        self.bateaux = list(config.bateaux if bateaux is None else bateaux)
+        self.totalCases = self.nbCases ** 2
+        self.uniforme = uniforme
+        self.maxEssais = maxEssais
+        self.repli = repli
+        self.essais = 0
+        # La dernière flotte a-t-elle été tirée uniformément
+        self.equiprobable = False
+        self._fenetres = None
+        self._nbt = 0
+        # Plus grands bateaux en premier, ce sont les plus difficiles à placer
+        self._ordre = sorted(range(len(self.bateaux)),
+                             key=lambda i : -self.bateaux[i])
+
+    def _positionnements(self, taille) :
+        ''' Méthode interne '''
+        '''
+        Retourne la liste des masques de débuts des positionnements possibles
+        d'un bateau de la taille fournie sous forme de tuples (nombre de
+        positionnements, orientation, ligne, masque des colonnes de début) et
+        leur nombre total.
+        '''
+        lignes = self._lignes
+        debuts = []
+        total = 0
+        # Horizontaux : débuts dont les « taille » cases suivantes sont libres
+        if taille <= self.nbCases :
+            limite = (1 << (self.nbCases - taille + 1)) - 1
+            for l, ligne in enumerate(lignes) :
+                m = ligne & limite
+                for k in range(1, taille) :
+                    if not m :
+                        break
+                    m &= ligne >> k
+                if m :
+                    n = bin(m).count('1')
+                    debuts.append((n, HORIZONTAL, l, m))
+                    total += n
+        # Verticaux : colonnes libres sur « taille » lignes consécutives
+        if taille > 1 :
+            for l in range(self.nbCases - taille + 1) :
+                m = lignes[l]
+                for k in range(1, taille) :
+                    if not m :
+                        break
+                    m &= lignes[l + k]
+                if m :
+                    n = bin(m).count('1')
+                    debuts.append((n, VERTICAL, l, m))
+                    total += n
+        return debuts, total
+
+    def _choisir(self, taille, exclus) :
+        ''' Méthode interne '''
+        '''
+        Retourne un positionnement (orientation, ligne, colonne) possible de la
+        taille fournie tiré uniformément hors de ceux exclus, ou None.
+        '''
+        debuts, total = self._positionnements(taille)
+        if total <= len(exclus) :
             return None
-
-        bg, bd = bornesGrille(n, config.nombreCases)
-        positionnements = {}
-
-        if n - (tailleBateau-1) * config.nombreCases > 0 :
-            positionnements['N'] = list(range(n-(tailleBateau-1)\
-                                        *config.nombreCases, n+1,
-                                        config.nombreCases))
-        if n + (tailleBateau-1) * config.nombreCases < self.totalCases :
-            positionnements['S'] = list(range(n, n+(tailleBateau-1)\
-                                        *config.nombreCases+1,
-                                        config.nombreCases))
-        if n + tailleBateau - 1 <= bd :
-            positionnements['E'] = list(range(n, n+tailleBateau))
-        if n - tailleBateau - 1 >= bg :
-            positionnements['O'] = list(range(n-tailleBateau+1, n+1))
-
-        if positionnements :
-            for c, v in positionnements.copy().items() :
-                if set(v) & set(casesDisponibles) != set(v) :
-                    del(positionnements[c])
-                else :
-                    # Juxtaposition de bateux interdites
-                    if not self.bateauxAdjacents :
-                        adjacentes = []
-                        # Vérifications des adjacentes
-                        if c in ('N', 'S') :
-                            if min(v) - config.nombreCases > 0 :
-                                adjacentes.append(min(v)-config.nombreCases)
-                            if max(v) + config.nombreCases <= self.totalCases :
-                                adjacentes.append(max(v) + config.nombreCases)
-
-                            bgNS, bdNS = bornesGrille(min(v),
-                                                      config.nombreCases)
-                            if min(v) + 1 <= bdNS :
-                                adjacentes.extend([i + 1 for i in v])
-                            if min(v) - 1 >= bgNS :
-                                adjacentes.extend([i - 1 for i in v])
-                        else :
-                            if min(v) - 1 >= bg :
-                                adjacentes.append(min(v) - 1)
-                            if max(v) + 1 <= bd :
-                                adjacentes.append(max(v) + 1)
-                            if min(v) - config.nombreCases > 0 :
-                                adjacentes.extend([i
-                                            - config.nombreCases for i in v])
-                            if min(v) + config.nombreCases <= self.totalCases :
-                                adjacentes.extend([i + config.nombreCases
-                                                   for i in v])
-
-                        if set(adjacentes) & set(casesDisponibles)\
-                                                            != set(adjacentes) :
-                            del(positionnements[c])
-
-        # Si positionnements est vide, c'est que les cases du bateau ou leurs
-        # cases adjacentes ne sont pas disponibles
-        if not positionnements :
-            casesDisponibles.remove(n)
-            return self._selectionnerPositions(casesDisponibles, tailleBateau)
+        while True :
+            r = self._hasard.randrange(total)
+            for n, orientation, ligne, m in debuts :
+                if r < n :
+                    break
+                r -= n
+            # r-ième bit à 1 du masque des débuts
+            for _ in range(r) :
+                m &= m - 1
+            choix = (orientation, ligne, (m & -m).bit_length() - 1)
+            if choix not in exclus :
+                return choix
+
+    def _placer(self, taille, orientation, ligne, colonne) :
+        ''' Méthode interne '''
+        '''
+        Occupe les cases du positionnement fourni ainsi que, si les bateaux ne
+        peuvent être juxtaposés, leurs adjacentes. Retourne la liste (index de
+        ligne, ancien masque) des lignes modifiées.
+        '''
+        n = self.nbCases
+        if orientation == HORIZONTAL :
+            l0, l1 = ligne, ligne + 1
+            masque = ((1 << taille) - 1) << colonne
         else :
-            d = choice(list(positionnements.keys()))
-            for v in positionnements[d] :
-                casesDisponibles.remove(v)
-            return positionnements[d]
+            l0, l1 = ligne, ligne + taille
+            masque = 1 << colonne
+        # Lignes du bateau et, hors diagonales, lignes au-dessus et en dessous
+        lignes = [(l, masque) for l in range(l0, l1)]
+        if not self.bateauxAdjacents :
+            cotes = (masque | masque << 1 | masque >> 1) & ((1 << n) - 1)
+            lignes = [(l, cotes) for l, _ in lignes]
+            lignes += [(l, masque) for l in (l0 - 1, l1) if 0 <= l < n]
+        anciens = []
+        for l, occupees in lignes :
+            anciens.append((l, self._lignes[l]))
+            self._lignes[l] &= ~occupees
+        return anciens
+
+    def _libre(self, taille, orientation, ligne, colonne) :
+        ''' Méthode interne '''
+        ''' Retourne True si les cases du positionnement sont disponibles '''
+        plein = (1 << taille) - 1
+        if orientation == HORIZONTAL :
+            return self._lignes[ligne] >> colonne & plein == plein
+        for l in range(ligne, ligne + taille) :
+            if not self._lignes[l] >> colonne & 1 :
+                return False
+        return True
+
+    def _tirerUniforme(self) :
+        ''' Méthode interne '''
+        '''
+        Tire une flotte uniformément parmi les flottes légales par rejet, et
+        retourne la liste des positionnements de ses bateaux (dans l'ordre de
+        placement), ou None après maxEssais essais.
+        '''
+        n = self.nbCases
+        if n <= LIMITE_FENETRES :
+            return self._tirerUniformeFenetres()
+        for essai in range(1, self.maxEssais + 1) :
+            self.essais = essai
+            self._lignes = [(1 << n) - 1] * n
+            places = []
+            for i in self._ordre :
+                taille = self.bateaux[i]
+                # Positionnement tiré parmi tous ceux de la grille vide
+                largeur = n - taille + 1
+                r = self._hasard.randrange(n * largeur * (2 if taille > 1\
+                                                           else 1))
+                if r < n * largeur :
+                    orientation = HORIZONTAL
+                    ligne, colonne = divmod(r, largeur)
+                else :
+                    orientation = VERTICAL
+                    ligne, colonne = divmod(r - n * largeur, n)
+                if not self._libre(taille, orientation, ligne, colonne) :
+                    break
+                self._placer(taille, orientation, ligne, colonne)
+                places.append((orientation, ligne, colonne))
+            else :
+                return places
+        return None
 
-    def positionner(self, nbt=0, maxt=100) :
+    def _tirerUniformeFenetres(self) :
+        ''' Méthode interne '''
+        '''
+        Tirage uniforme par rejet sur les masques de la grille entière des
+        positionnements de la topologie, plus rapide sur les petites grilles.
+        '''
+        if self._fenetres is None :
+            # Pour chaque bateau dans l'ordre de placement : positionnements
+            # (code, masque, masque des cases interdites ensuite) et nombre
+            topologie = topologieGrille(self.nbCases)
+            self._fenetres = []
+            for i in self._ordre :
+                positionnements = tuple((code, masque,
+                                         masque if self.bateauxAdjacents\
+                                         else halo)\
+                                        for code, masque, halo in\
+                                        topologie.fenetres(self.bateaux[i]))
+                self._fenetres.append((positionnements, len(positionnements)))
+        # Un seul entier tiré par essai, dont les chiffres en base mixte
+        # (nombres de positionnements de chaque bateau) sont les index des
+        # positionnements, indépendants et uniformes
+        produit = 1
+        for _, nombre in self._fenetres :
+            produit *= nombre
+        bits = produit.bit_length()
+        tirer = self._hasard.getrandbits
+        for essai in range(1, self.maxEssais + 1) :
+            r = tirer(bits)
+            while r >= produit :
+                r = tirer(bits)
+            interdites = 0
+            places = []
+            for positionnements, nombre in self._fenetres :
+                r, k = divmod(r, nombre)
+                code, masque, interdit = positionnements[k]
+                if masque & interdites :
+                    break
+                interdites |= interdit
+                places.append(code)
+            else :
+                self.essais = essai
+                places = [(orientation,) + divmod(case - 1, self.nbCases)\
+                          for case, orientation in\
+                          (divmod(code, 2) for code in places)]
+                return places
+        self.essais = self.maxEssais
+        return None
+
+    def _tirerRetourArriere(self, maxt) :
+        ''' Méthode interne '''
+        '''
+        Place les bateaux un à un avec retour arrière local et retourne la
+        liste des positionnements de ses bateaux (dans l'ordre de placement),
+        ou None après maxt tentatives.
+        '''
+        ordre = self._ordre
+        for nbt in range(maxt) :
+            self._lignes = [(1 << self.nbCases) - 1] * self.nbCases
+            # Pour chaque bateau placé : positionnement, lignes modifiées et
+            # positionnements déjà essayés à ce niveau
+            places, exclus = [], [set()]
+            retours = 10 * len(ordre)
+            while len(places) < len(ordre) and retours >= 0 :
+                taille = self.bateaux[ordre[len(places)]]
+                choix = self._choisir(taille, exclus[-1])
+                if choix is not None :
+                    exclus[-1].add(choix)
+                    places.append((choix, self._placer(taille, *choix)))
+                    exclus.append(set())
+                    continue
+                # Aucun positionnement : retour arrière sur le bateau précédent
+                retours -= 1
+                if not places :
+                    break
+                exclus.pop()
+                _, anciens = places.pop()
+                for l, masque in anciens :
+                    self._lignes[l] = masque
+            if len(places) == len(ordre) :
+                self._nbt = nbt
+                return [choix for choix, _ in places]
+        return None
+
+    def _cases(self, taille, orientation, ligne, colonne) :
+        ''' Méthode interne '''
+        ''' Retourne la liste croissante des cases d'un positionnement '''
+        pas = 1 if orientation == HORIZONTAL else self.nbCases
+        debut = ligne * self.nbCases + colonne + 1
+        return list(range(debut, debut + taille * pas, pas))
+
+    def positionner(self, maxt=100) :
         '''
         Positionne aléatoirement les bateaux sur la grille et retourne un dict
         avec pour clés les ids des bateaux, et pour valeurs la liste des numéros
         de cases sur lesquelles ils se situent.
+        @param maxt : nombre maximum de tentatives sans tirage uniforme, chacune
+                      étant abandonnée (et la flotte entièrement repositionnée)
+                      après un nombre de retours arrière proportionnel au
+                      nombre de bateaux
         '''
-
+        places = None
+        self.essais, self._nbt = 0, 0
+        if self.uniforme :
+            places = self._tirerUniforme()
+            if places is None :
+                if not self.repli :
+                    raise RuntimeError('Aucune flotte n\'a été tirée'
+                                       ' uniformément après {} essais'\
+                                       .format(self.maxEssais))
+                journal.warning('Tirage uniforme abandonné après %s essais,'
+                                ' flotte placée avec retour arrière',
+                                self.maxEssais)
+        self.equiprobable = places is not None
+        if places is None :
+            places = self._tirerRetourArriere(maxt)
+        if places is not None :
+            flotte = [None] * len(self.bateaux)
+            for i, choix in zip(self._ordre, places) :
+                flotte[i] = self._cases(self.bateaux[i], *choix)
+            return dict(enumerate(flotte))
         # Ceci ne devrait jamais se produire car le maximum de cases bateaux ne
         # doit jamais excéder 1/4 du nombre total de cases de la grille.
-        if nbt == maxt :
-            raise RuntimeError('Il n\'a pas été possible de placer après {}'
-                               ' tentatives les bateaux sur la grille'\
-                               .format(maxt))
-        casesDisponibles = list(range(1, self.totalCases+1))
-        pos = {}
-
-        for i, taille in enumerate(config.bateaux) :
-            sp = self._selectionnerPositions(casesDisponibles, taille)
-            if not sp :
-                return self.positionner(nbt+1, maxt)
-            pos[i] = sp
-        self._nbt = nbt
-        return pos
+        raise RuntimeError('Il n\'a pas été possible de placer après {}'
+                           ' tentatives les bateaux sur la grille'\
+                           .format(maxt))
+
+    def positionnerLot(self, n, workers=0, bloc=1000, pool=None) :
+        '''
+        Générateur tirant n flottes, par blocs, et retournant chaque bloc sous
+        la forme d'un array('H') : pour chaque flotte du bloc, les cases de
+        chaque bateau dans l'ordre de leurs ids (soit sum(bateaux) cases par
+        flotte). Les blocs sont tirés par un pool de processus, chacun avec sa
+        propre graine dérivée, le lot ne dépend ainsi que du générateur
+        aléatoire de la disposition et non du nombre de processus. Les blocs
+        sont soumis au fur et à mesure, seuls quelques-uns par processus étant
+        en cours à la fois : la mémoire occupée et le délai avant le premier
+        bloc ne croissent donc pas avec n.
+        @param n       : nombre de flottes à tirer
+        @param workers : nombre de processus du pool, 0 pour tirer les flottes
+                         dans le processus courant
+        @param bloc    : nombre de flottes par bloc
+        @param pool    : pool de processus existant à utiliser plutôt que d'en
+                         créer un de workers processus
+        '''
+        graine = self._hasard.getrandbits(64)
+        taches = ((self.bateauxAdjacents, self.nbCases, tuple(self.bateaux),
+                   self.uniforme, self.maxEssais, self.repli,
+                   deriverGraine(graine, i), min(bloc, n - debut))\
+                  for i, debut in enumerate(range(0, n, bloc)))
+        if pool is not None :
+            yield from self._soumettreLot(pool, max(1, workers), taches)
+            return
+        if not workers :
+            for tache in taches :
+                yield tirerBloc(*tache)
+            return
+        # Processus démarrés par « spawn », comme libs.obtenirPool
+        with multiprocessing.get_context('spawn').Pool(workers) as pool :
+            yield from self._soumettreLot(pool, workers, taches)
+
+    def _soumettreLot(self, pool, processus, taches) :
+        ''' Méthode interne '''
+        '''
+        Générateur soumettant les tâches de tirage des blocs au pool fourni,
+        au plus deux par processus étant en cours, et retournant les blocs dans
+        l'ordre des tâches.
+        '''
+        enCours = []
+        for tache in taches :
+            enCours.append(pool.apply_async(tirerBloc, tache))
+            if len(enCours) >= 2 * processus :
+                yield enCours.pop(0).get()
+        while enCours :
+            yield enCours.pop(0).get()
+
+    def enregistrerLot(self, fichier, n, workers=0, bloc=1000) :
+        '''
+        Tire n flottes (voir positionnerLot) et les enregistre au fil de l'eau
+        dans le fichier fourni, lisible par chargerLot.
+        Format du fichier (entiers petit-boutistes) :
+            - entête : signature, version, nombre de cases du côté, nombre de
+              bateaux, nombre de flottes
+            - taille de chaque bateau sur 2 octets
+            - cases de chaque flotte sur 2 octets
+        @param fichier : fichier du lot
+        @param n       : nombre de flottes à tirer
+        @param workers : nombre de processus du pool
+        @param bloc    : nombre de flottes par bloc
+        '''
+        repertoire = os.path.dirname(fichier)
+        if repertoire :
+            os.makedirs(repertoire, exist_ok=True)
+        temporaire = fichier + '.tmp'
+        with open(temporaire, 'wb') as f :
+            f.write(struct.pack(ENTETE_LOT, SIGNATURE_LOT, VERSION_LOT,
+                                self.nbCases, len(self.bateaux), n))
+            f.write(struct.pack('<{}H'.format(len(self.bateaux)),
+                                *self.bateaux))
+            for cases in self.positionnerLot(n, workers, bloc) :
+                if sys.byteorder == 'big' :
+                    cases.byteswap()
+                cases.tofile(f)
+        os.replace(temporaire, fichier)
 
     @property
     def nbt(self) :
@@ -334,3 +622,123 @@ class DispositionAleatoire :
         exécution de positionner
         '''
         return self._nbt
+
+
+def tirerBloc(bateauxAdjacents, nbCases, bateaux, uniforme, maxEssais, repli,
+              graine, nombre) :
+    '''
+    Tire un bloc de flottes pour DispositionAleatoire.positionnerLot et le
+    retourne sous la forme d'un array('H') des cases des bateaux de chaque
+    flotte. Fonction de module afin de pouvoir être exécutée par un processus
+    du pool.
+    @param graine : graine du générateur aléatoire du bloc
+    @param nombre : nombre de flottes du bloc
+    '''
+    disposition = DispositionAleatoire(bateauxAdjacents, graine, nbCases,
+                                       bateaux, uniforme, maxEssais, repli)
+    cases = array('H')
+    for _ in range(nombre) :
+        for bateau in disposition.positionner().values() :
+            cases.extend(bateau)
+    return cases
+
+
+SIGNATURE_LOT = b'BNLF'
+VERSION_LOT = 1
+ENTETE_LOT = '<4sHHHI'
+
+def chargerLot(fichier) :
+    '''
+    Projette en mémoire (mmap) un lot de flottes enregistré par
+    DispositionAleatoire.enregistrerLot et retourne le tuple (nombre de cases
+    du côté, tailles des bateaux, cases), cases étant une vue ('H') des cases
+    des bateaux de toutes les flottes, celles de la flotte i débutant à
+    l'index i * sum(tailles des bateaux).
+    '''
+    with open(fichier, 'rb') as f :
+        donnees = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    debut = struct.calcsize(ENTETE_LOT)
+    signature, version, nbCases, nbBateaux, nombre =\
+            struct.unpack_from(ENTETE_LOT, donnees)
+    if (signature, version) != (SIGNATURE_LOT, VERSION_LOT) :
+        raise ValueError('Le fichier {} n\'est pas un lot de flottes'\
+                         .format(fichier))
+    bateaux = struct.unpack_from('<{}H'.format(nbBateaux), donnees, debut)
+    debut += nbBateaux * 2
+    cases = memoryview(donnees)[debut:debut + nombre * sum(bateaux) * 2]
+    return nbCases, list(bateaux), cases.cast('H')
+
+
+class ReserveFlottes :
+    '''
+    Réserve de flottes aléatoires (voir DispositionAleatoire.positionner)
+    d'une grille, afin que le tirage d'une flotte par l'interface ne soit pas
+    bloquant, même sur les grilles grandes ou denses.
+    Les flottes sont tirées par blocs par le pool de processus des réserves
+    (voir DispositionAleatoire.positionnerLot) : le thread de remplissage ne
+    fait qu'attendre les blocs et les découper en flottes, sans concurrencer
+    l'interface pour le GIL. Il reste bloqué tant que la réserve est pleine.
+    '''
+    def __init__(self, nbCases, bateaux, bateauxAdjacents, taille=4) :
+        '''
+        @param nbCases          : nombre de cases du côté de la grille
+        @param bateaux          : liste des tailles de bateaux
+        @param bateauxAdjacents : si False, deux bateaux ne peuvent se toucher
+        @param taille           : nombre de flottes tenues prêtes, et de
+                                  flottes par bloc
+        '''
+        self._parametres = (bateauxAdjacents, None, nbCases, list(bateaux))
+        self._flottes = queue.Queue(taille)
+        self._remplisseur = threading.Thread(target=self._remplir,
+                                             daemon=True)
+        self._remplisseur.start()
+
+    def _remplir(self) :
+        ''' Méthode interne '''
+        ''' Découpe en flottes les blocs tirés par le pool et les réserve '''
+        disposition = DispositionAleatoire(*self._parametres)
+        try :
+            for cases in disposition.positionnerLot(
+                            sys.maxsize, bloc=self._flottes.maxsize,
+                            pool=obtenirPool('reserves')) :
+                debut = 0
+                while debut < len(cases) :
+                    flotte = {}
+                    for i, taille in enumerate(disposition.bateaux) :
+                        flotte[i] = list(cases[debut:debut + taille])
+                        debut += taille
+                    self._flottes.put(flotte)
+        except (OSError, RuntimeError, ValueError) as erreur :
+            # Pool indisponible ou terminé : les flottes seront tirées à la
+            # demande
+            journal.warning('Remplissage de la réserve de flottes arrêté : %s',
+                            erreur)
+
+    def prendre(self) :
+        '''
+        Retourne une flotte de la réserve, ou à défaut une flotte tirée
+        immédiatement si la réserve est vide.
+        '''
+        try :
+            return self._flottes.get_nowait()
+        except queue.Empty :
+            return DispositionAleatoire(*self._parametres).positionner()
+
+
+_reservesFlottes = {}
+
+def reserveFlottes(idJeu, nbCases, bateaux, bateauxAdjacents) :
+    '''
+    Retourne la réserve de flottes de la grille fournie, créée (et son
+    remplissage démarré) une seule fois par processus.
+    @param idJeu            : identifiant de la grille
+    @param nbCases          : nombre de cases du côté de la grille
+    @param bateaux          : liste des tailles de bateaux
+    @param bateauxAdjacents : juxtaposition des bateaux, chaque mode ayant sa
+                              propre réserve
+    '''
+    cle = (idJeu, bool(bateauxAdjacents))
+    if cle not in _reservesFlottes :
+        _reservesFlottes[cle] = ReserveFlottes(nbCases, bateaux,
+                                               bateauxAdjacents)
+    return _reservesFlottes[cle]
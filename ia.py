@@ -1,18 +1,841 @@
 #IA
 
-import re
-from random import choice, shuffle
+import os
+import multiprocessing
+from random import Random
+from collections import namedtuple
+from time import time
+from heapq import heappush, heappop
 from copy import deepcopy
-from operator import itemgetter
 
 import config 
-from libs import Journalisation, bornesGrille, genItemListe
+from libs import Journalisation, JournalDecisions, LivreOuvertures,\
+                 carteFlottes, casesMasque, deriverGraine,\
+                 fichierLivreOuvertures, genItemListe, obtenirHasard,\
+                 obtenirPool, tablesPlacements, topologieGrille
+
+# Stratégies de tirage de l'ia :
+# - zones   : répartition des tirs par zones puis par appui binaire
+# - densite : tir sur la case pouvant contenir le plus de positionnements des
+#             bateaux restants
+# - montecarlo : comme densite pour la recherche, mais l'exploitation des cases
+#                touchées se fait par tirage de dispositions complètes de la
+#                flotte restante
+STRATEGIES = ('zones', 'densite', 'montecarlo')
+
+# État complet et immuable d'une ia, retourné par IA.snapshot
+EtatIA = namedtuple('EtatIA', ('nbCases', 'bateaux', 'bateauxAdjacents',
+                               'strategie', 'mtb', 'tirees', 'tirages',
+                               'exploitation', 'taillesBateaux',
+                               'tailleMinimumBateau', 'reportExclusion',
+                               'prochainTirages', 'tour', 'hasard'))
+
+
+def _ajouterTranches(compteur, valeur) :
+    '''
+    Additionne en place dans compteur la valeur fournie.
+    Compteur et valeur sont des entiers « tranchés » : des listes de masques
+    où le masque d'index i contient le bit de poids 2**i de la valeur de chaque
+    case, ce qui permet d'additionner les valeurs de toutes les cases de la
+    grille en quelques opérations binaires.
+    '''
+    retenue = 0
+    i = 0
+    while i < len(valeur) or retenue :
+        if i == len(compteur) :
+            compteur.append(0)
+        a = compteur[i]
+        v = valeur[i] if i < len(valeur) else 0
+        compteur[i] = a ^ v ^ retenue
+        retenue = a & v | retenue & (a ^ v)
+        i += 1
+
+
+def _multiplierTranches(valeur, facteur) :
+    '''
+    Retourne le produit de l'entier tranché valeur par l'entier facteur.
+    '''
+    produit = []
+    decalage = 0
+    while facteur :
+        if facteur & 1 :
+            _ajouterTranches(produit, [0] * decalage + valeur)
+        facteur >>= 1
+        decalage += 1
+    return produit
+
+
+def _maximumTranches(compteur, candidats) :
+    '''
+    Retourne le masque des cases parmi les candidats ayant la plus grande valeur
+    dans le compteur tranché fourni.
+    '''
+    for plan in reversed(compteur) :
+        if candidats & plan :
+            candidats &= plan
+    return candidats
+
+
+def _fenetresPermises(tables, taille, permises) :
+    '''
+    Retourne la liste des positionnements d'un bateau de la taille fournie
+    n'occupant que des cases permises, sous forme de tuples (masque des cases du
+    bateau, masque des cases du bateau et de leurs adjacentes).
+    @param tables : TablesPlacements de la grille
+    '''
+    return [(masque, halo) for masque, halo in zip(tables.masques(taille),
+                                                   tables.halos(taille))\
+            if not masque & ~permises]
+
+
+def echantillonnerFlottes(nbCases, bateaux, tailles, bloquees, touchees,
+                          bateauxAdjacents, repertoire, graine, nombre,
+                          echeance) :
+    '''
+    Tire au hasard jusqu'à « nombre » dispositions complètes des bateaux
+    restants cohérentes avec les observations, ou jusqu'à l'échéance, et
+    retourne un tuple (liste du poids des dispositions occupant chaque case
+    (index 0 inutilisé), nombre de dispositions tirées).
+    Les dispositions sont tirées par échantillonnage d'importance : chaque case
+    touchée non encore couverte l'est par un positionnement tiré uniformément
+    parmi ceux la couvrant, les autres bateaux étant tirés uniformément parmi
+    les positionnements hors des cases touchées, la disposition entière étant
+    rejetée au moindre conflit. Chaque disposition est pondérée par l'inverse de
+    sa probabilité d'être tirée, les poids par case suivent ainsi la loi a
+    posteriori des dispositions. Aucun bateau restant ne peut n'occuper que des
+    cases touchées, il aurait sinon été annoncé coulé.
+    Fonction de module afin de pouvoir être exécutée par un processus du pool.
+    @param bateaux          : tailles de tous les bateaux de la grille
+    @param tailles          : tailles des bateaux restants
+    @param bloquees         : masque des cases ne pouvant contenir de bateau
+                              (cases manquées, coulées ou exclues)
+    @param touchees         : masque des cases touchées dont le bateau n'a pas
+                              été coulé, chacune devant être couverte
+    @param bateauxAdjacents : si False, deux bateaux ne peuvent se toucher
+    @param repertoire       : répertoire des données où sont enregistrées les
+                              tables des positionnements
+    @param graine           : graine du générateur aléatoire
+    @param nombre           : nombre de dispositions à tirer, au plus 100 fois
+                              autant d'essais étant faits
+    @param echeance         : time() au-delà duquel le tirage s'arrête, None
+                              pour n'être limité que par le nombre
+    '''
+    hasard = Random(graine)
+    permises = ((1 << nbCases ** 2) - 1) & ~bloquees
+    tables = tablesPlacements(nbCases, bateaux, repertoire)
+    fenetres, libres = {}, {}
+    for taille in set(tailles) :
+        fenetres[taille] = [f for f in _fenetresPermises(tables, taille,
+                                                         permises)\
+                            if f[0] & ~touchees]
+        libres[taille] = [f for f in fenetres[taille] if not f[0] & touchees]
+    # Positionnements couvrant chaque case touchée, calculés à la demande
+    couvrantes = {}
+    comptes = [0] * (nbCases ** 2 + 1)
+    tirees = 0
+    essais = 0
+    while tirees < nombre and essais < 100 * nombre\
+          and (echeance is None or time() < echeance) :
+        essais += 1
+        restants = list(tailles)
+        occupees, interdites = 0, 0
+        poids = 1.0
+        valide = True
+        # Couverture de chaque case touchée, de la plus petite à la plus grande
+        aCouvrir = touchees
+        while aCouvrir :
+            case = aCouvrir & -aCouvrir
+            if case not in couvrantes :
+                couvrantes[case] = [(t, f) for t in fenetres\
+                                    for f in fenetres[t] if f[0] & case]
+            candidats = [(t, f) for t, f in couvrantes[case]\
+                         if t in restants and not f[0] & interdites]
+            if not candidats :
+                valide = False
+                break
+            poids *= len(candidats)
+            taille, (masque, halo) = hasard.choice(candidats)
+            restants.remove(taille)
+            occupees |= masque
+            interdites |= masque if bateauxAdjacents else halo
+            aCouvrir &= ~masque
+        # Autres bateaux, chacun tiré parmi tous ses positionnements hors des
+        # cases touchées : les bateaux d'une même taille étant
+        # interchangeables, une disposition est tirée dans chaque ordre
+        for taille in restants :
+            if not valide :
+                break
+            if not libres[taille] :
+                valide = False
+                break
+            masque, halo = hasard.choice(libres[taille])
+            if masque & interdites :
+                valide = False
+                break
+            occupees |= masque
+            interdites |= masque if bateauxAdjacents else halo
+            poids *= len(libres[taille])
+        if not valide :
+            continue
+        for taille in set(restants) :
+            for k in range(2, restants.count(taille) + 1) :
+                poids /= k
+        occupees &= ~touchees
+        while occupees :
+            bit = occupees & -occupees
+            comptes[bit.bit_length()] += poids
+            occupees ^= bit
+        tirees += 1
+    return comptes, tirees
+
+
+class DensitePlacements :
+    '''
+    Table du nombre de positionnements possibles des bateaux restants passant
+    par chaque case de la grille, maintenue de façon incrémentale au fil des
+    tirs : seuls les positionnements passant par une case bloquée sont retirés.
+    '''
+    def __init__(self, nbCases, bateaux) :
+        '''
+        @param nbCases : nombre de cases du côté de la grille
+        @param bateaux : liste des tailles de bateaux, par exemple :
+                         [5, 4, 3, 2, 2]
+        '''
+        self._nbCases = nbCases
+        self._bloquees = 0
+        self._nombres = {}
+        for taille in bateaux :
+            self._nombres[taille] = self._nombres.get(taille, 0) + 1
+
+        # Pour chaque taille, couche du nombre de positionnements par case et
+        # masques des débuts de positionnements (horizontaux, verticaux)
+        # encore valides, le bit case - 1 étant celui de la case de début. Un
+        # bateau d'une case n'a que des positionnements horizontaux.
+        self._couches = {}
+        self._debuts = {}
+        self.comptes = [0] * (nbCases ** 2 + 1)
+        for taille, nombre in self._nombres.items() :
+            couche = [0]
+            debutsH, debutsV = 0, 0
+            for ligne in range(nbCases) :
+                for colonne in range(nbCases) :
+                    couche.append(self._nombreFenetres(colonne, taille)\
+                                  + (self._nombreFenetres(ligne, taille)\
+                                     if taille > 1 else 0))
+                    if colonne <= nbCases - taille :
+                        debutsH |= 1 << (ligne * nbCases + colonne)
+                    if ligne <= nbCases - taille and taille > 1 :
+                        debutsV |= 1 << (ligne * nbCases + colonne)
+            self._couches[taille] = couche
+            self._debuts[taille] = [debutsH, debutsV]
+            for case in range(1, nbCases ** 2 + 1) :
+                self.comptes[case] += nombre * couche[case]
+
+        # Seaux des cases non bloquées par nombre de positionnements, les
+        # nombres ne pouvant que diminuer, le maximum ne fait que descendre.
+        self._seaux = {}
+        for case in range(1, nbCases ** 2 + 1) :
+            self._seaux.setdefault(self.comptes[case], set()).add(case)
+        self._maximum = max(self._seaux)
+
+    def copie(self) :
+        ''' Retourne une copie indépendante de la table '''
+        copie = DensitePlacements.__new__(DensitePlacements)
+        copie._nbCases = self._nbCases
+        copie._bloquees = self._bloquees
+        copie._nombres = dict(self._nombres)
+        copie._couches = dict((t, list(c)) for t, c in self._couches.items())
+        copie._debuts = dict((t, list(d)) for t, d in self._debuts.items())
+        copie.comptes = list(self.comptes)
+        copie._seaux = dict((n, set(c)) for n, c in self._seaux.items())
+        copie._maximum = self._maximum
+        return copie
+
+    def _nombreFenetres(self, position, taille) :
+        ''' Méthode interne '''
+        '''
+        Nombre de positionnements d'une taille donnée passant par la position
+        fournie (index dans la ligne ou la colonne) sur une grille vide.
+        '''
+        return max(0, min(position, self._nbCases - taille)\
+                      - max(0, position - taille + 1) + 1)
+
+    def _changer(self, case, compte) :
+        ''' Méthode interne '''
+        ''' Change le nombre de positionnements de la case fournie '''
+        if not self._bloquees >> (case - 1) & 1 :
+            self._seaux[self.comptes[case]].discard(case)
+            self._seaux.setdefault(compte, set()).add(case)
+        self.comptes[case] = compte
+
+    def bloquer(self, case) :
+        '''
+        Retire tous les positionnements passant par la case fournie, celle-ci
+        ne pouvant plus contenir un bateau restant (case tirée).
+        '''
+        self.bloquerMasque(1 << (case - 1))
+
+    def bloquerMasque(self, masque) :
+        '''
+        Retire tous les positionnements passant par les cases du masque fourni
+        (bit case - 1), en une seule passe quel que soit leur nombre.
+        Coût proportionnel au nombre de positionnements retirés et à la taille
+        de leurs bateaux.
+        '''
+        masque &= ~self._bloquees
+        if not masque :
+            return
+        for case in casesMasque(masque) :
+            self._seaux[self.comptes[case]].discard(case)
+        self._bloquees |= masque
+        # Diminution totale par case, afin de ne déplacer chaque case qu'une
+        # seule fois de seau
+        diminutions = {}
+        for taille, couche in self._couches.items() :
+            nombre = self._nombres[taille]
+            debuts = self._debuts[taille]
+            for axe, pas in ((0, 1), (1, self._nbCases)) :
+                # Débuts valides des positionnements passant par le masque ;
+                # un décalage horizontal débordant sur la ligne précédente
+                # n'atteint que des colonnes où aucun positionnement ne débute
+                atteints = 0
+                for k in range(taille) :
+                    atteints |= masque >> (k * pas)
+                retires = debuts[axe] & atteints
+                debuts[axe] ^= retires
+                while retires :
+                    bit = retires & -retires
+                    debut = bit.bit_length() - 1
+                    for n in range(debut + 1, debut + taille * pas + 1, pas) :
+                        couche[n] -= 1
+                        diminutions[n] = diminutions.get(n, 0) + nombre
+                    retires ^= bit
+        for n, diminution in diminutions.items() :
+            self._changer(n, self.comptes[n] - diminution)
+
+    def supprimerBateau(self, taille) :
+        '''
+        Retire la couche de positionnements d'un bateau de la taille fournie,
+        celui-ci ayant été coulé.
+        '''
+        if not self._nombres.get(taille) :
+            raise ValueError('Aucun bateau de taille {} ne reste à positionner'\
+                             .format(taille))
+        couche = self._couches[taille]
+        for case in range(1, self._nbCases ** 2 + 1) :
+            if couche[case] :
+                self._changer(case, self.comptes[case] - couche[case])
+        self._nombres[taille] -= 1
+        if not self._nombres[taille] :
+            del(self._nombres[taille], self._couches[taille],
+                self._debuts[taille])
+
+    def meilleures(self) :
+        '''
+        Retourne la liste des cases non bloquées ayant le plus grand nombre de
+        positionnements, ou à défaut toutes les cases non bloquées.
+        '''
+        while self._maximum > 0 and not self._seaux.get(self._maximum) :
+            self._maximum -= 1
+        meilleures = self._seaux.get(self._maximum)
+        if not meilleures :
+            # Retours de tir incohérents (comptes négatifs) : toutes les cases
+            # non bloquées, comme la stratégie par zones
+            meilleures = [n for n in range(1, self._nbCases ** 2 + 1)\
+                          if not self._bloquees >> (n - 1) & 1]
+        return sorted(meilleures)
+
+
+
+class DonneesGrille :
+    '''
+    Données de l'ia ne dépendant que de la grille (nombre de cases et tailles
+    des bateaux), calculées une seule fois par grille et partagées par toutes
+    les ia (voir donneesGrille). Ces données ne doivent pas être modifiées.
+    '''
+    def __init__(self, nbCases, bateaux) :
+        '''
+        @param nbCases : nombre de cases du côté de la grille
+        @param bateaux : liste des tailles de bateaux
+        '''
+        self.nbCases = nbCases
+        self.bateaux = tuple(bateaux)
+        self._densite = None
+
+        # Masques constants de la grille, repris de sa topologie
+        self.topologie = topologieGrille(nbCases)
+        self.masqueGrille = self.topologie.masqueGrille
+        self.masqueLigne = self.topologie.masquesLignes[0]
+        self.masquesColonnes = self.topologie.masquesColonnes
+        self.masqueSansColonneGauche = self.topologie.masqueSansColonneGauche
+        self.masqueSansColonneDroite = self.topologie.masqueSansColonneDroite
+        # Pour chaque taille de bateau, masque des cases ne pouvant être le
+        # début d'un bateau horizontal (il déborderait sur la ligne suivante)
+        self.masquesHorsDebutsH = {}
+        for taille in set(bateaux) :
+            self.masquesHorsDebutsH[taille] = 0
+            for masque in self.masquesColonnes[nbCases - taille + 1:] :
+                self.masquesHorsDebutsH[taille] |= masque
+
+        # Cases de coins (hg, hd, bg, bd) et de leurs diagonales
+        self.casesCoins = (1, nbCases, nbCases ** 2 - nbCases + 1,
+                           nbCases ** 2)
+        self.casesDiagonaleCoins = (1 + nbCases + 1, nbCases * 2 - 1,
+                                    self.casesCoins[2] - nbCases + 1,
+                                    self.casesCoins[3] - nbCases - 1)
+
+        # Séparation de la grille en « zones » de 3 ou 4 cases de côté afin
+        # que les tirs soient répartis plus ou moins uniformément sur la grille.
+        # Notamment pour éviter que les tirs soient trop ciblés sur les mêmes
+        # zones de la grille.
+        cotes = [3] * (nbCases // 3)
+        # Ajout des reliquats
+        for i in range(nbCases % 3) :
+            cotes[i] += 1
+        # Tuples (cases de la zone, nombre de cases de la zone)
+        self.zones = []
+        y0 = 0
+        for y in cotes :
+            x0 = 0
+            for x in cotes :
+                cases = tuple(ligne * nbCases + colonne + 1\
+                              for ligne in range(y0, y0 + y)\
+                              for colonne in range(x0, x0 + x))
+                self.zones.append((cases, x * y))
+                x0 += x
+            y0 += y
+
+    def densite(self) :
+        '''
+        Retourne la table des positionnements d'une grille vierge, à copier
+        avant toute modification.
+        '''
+        if self._densite is None :
+            self._densite = DensitePlacements(self.nbCases, self.bateaux)
+        return self._densite
+
+
+_donneesGrilles = {}
+
+def donneesGrille(nbCases, bateaux) :
+    '''
+    Retourne les DonneesGrille partagées de la grille fournie.
+    @param nbCases : nombre de cases du côté de la grille
+    @param bateaux : liste des tailles de bateaux
+    '''
+    cle = (nbCases, tuple(sorted(bateaux)))
+    if cle not in _donneesGrilles :
+        _donneesGrilles[cle] = DonneesGrille(nbCases, bateaux)
+    return _donneesGrilles[cle]
+
+
+# Symétries d'une région hauteur x largeur : fonction (ligne, colonne, hauteur,
+# largeur) -> (ligne, colonne) dans la région transformée, et si la hauteur et
+# la largeur y sont inversées
+_SYMETRIES = ((lambda l, c, h, w : (l, c), False),
+              (lambda l, c, h, w : (l, w - 1 - c), False),
+              (lambda l, c, h, w : (h - 1 - l, c), False),
+              (lambda l, c, h, w : (h - 1 - l, w - 1 - c), False),
+              (lambda l, c, h, w : (c, l), True),
+              (lambda l, c, h, w : (c, h - 1 - l), True),
+              (lambda l, c, h, w : (w - 1 - c, l), True),
+              (lambda l, c, h, w : (w - 1 - c, h - 1 - l), True))
+
+# États des cases d'une région de grappe
+LIBRE, TOUCHEE, BLOQUEE = 0, 1, 2
+
+# Solutions des grappes déjà résolues, partagées par les ia :
+# (hauteur, largeur, états, tailles) canoniques -> solutions ou None
+_solutionsGrappes = {}
+_LIMITE_SOLUTIONS_GRAPPES = 20000
+_LIMITE_NOEUDS_GRAPPE = 50000
+
+def _formeCanonique(hauteur, largeur, etats) :
+    '''
+    Retourne la forme canonique (hauteur, largeur, états) d'une région parmi
+    ses 8 symétries, ainsi que la position dans celle-ci de chaque case de la
+    région fournie.
+    @param etats : bytes des états (LIBRE, TOUCHEE, BLOQUEE) des cases de la
+                   région ligne par ligne
+    '''
+    meilleure = None
+    for symetrie, inversee in _SYMETRIES :
+        h, w = (largeur, hauteur) if inversee else (hauteur, largeur)
+        positions = []
+        for l in range(hauteur) :
+            for c in range(largeur) :
+                nl, nc = symetrie(l, c, hauteur, largeur)
+                positions.append(nl * w + nc)
+        transformes = bytearray(len(etats))
+        for i, p in enumerate(positions) :
+            transformes[p] = etats[i]
+        forme = (h, w, bytes(transformes))
+        if meilleure is None or forme < meilleure[0] :
+            meilleure = (forme, positions)
+    return meilleure
+
+
+def _resoudreGrappe(hauteur, largeur, etats, tailles) :
+    '''
+    Dénombre les affectations des cases touchées d'une région à des bateaux de
+    tailles restantes distincts, compatibles avec les cases bloquées, chaque
+    case touchée étant couverte et chaque bateau occupant au moins une case non
+    touchée (il aurait sinon été coulé), et
+    retourne un dict tailles des bateaux utilisés -> (nombre d'affectations,
+    nombre d'affectations occupant chaque case libre de la région), ou None si
+    la recherche est trop longue.
+    @param etats   : bytes des états des cases de la région ligne par ligne
+    @param tailles : tuple trié des tailles des bateaux restants
+    '''
+    bloquees, touchees = 0, 0
+    for i, e in enumerate(etats) :
+        if e == BLOQUEE :
+            bloquees |= 1 << i
+        elif e == TOUCHEE :
+            touchees |= 1 << i
+    # Positionnements de chaque taille passant par chaque case touchée
+    couvrants = {}
+    for taille in set(tailles) :
+        masques = []
+        for l in range(hauteur) :
+            for c in range(largeur - taille + 1) :
+                masques.append(((1 << taille) - 1) << (l * largeur + c))
+        if taille > 1 :
+            colonne = sum(1 << (k * largeur) for k in range(taille))
+            for l in range(hauteur - taille + 1) :
+                for c in range(largeur) :
+                    masques.append(colonne << (l * largeur + c))
+        for m in masques :
+            # Un bateau n'occupant que des cases touchées aurait été coulé
+            if m & bloquees or not m & touchees or not m & ~touchees :
+                continue
+            t = m & touchees
+            while t :
+                bit = t & -t
+                couvrants.setdefault(bit, {}).setdefault(taille, []).append(m)
+                t ^= bit
+
+    solutions = {}
+    noeuds = 0
+    pile = [(touchees, 0, tailles, ())]
+    while pile :
+        restantes, occupees, reste, utilises = pile.pop()
+        if not restantes :
+            utilises = tuple(sorted(utilises))
+            if utilises not in solutions :
+                solutions[utilises] = [0, [0] * len(etats)]
+            solution = solutions[utilises]
+            solution[0] += 1
+            libres = occupees & ~touchees
+            while libres :
+                bit = libres & -libres
+                solution[1][bit.bit_length() - 1] += 1
+                libres ^= bit
+            continue
+        # La case touchée de plus petit index doit être couverte par l'un des
+        # bateaux restants, chaque taille n'étant essayée qu'une fois
+        bit = restantes & -restantes
+        for taille, masques in couvrants.get(bit, {}).items() :
+            if taille not in reste :
+                continue
+            i = reste.index(taille)
+            suivants = reste[:i] + reste[i + 1:]
+            for m in masques :
+                if m & occupees :
+                    continue
+                noeuds += 1
+                if noeuds > _LIMITE_NOEUDS_GRAPPE :
+                    return None
+                pile.append((restantes & ~m, occupees | m, suivants,
+                             utilises + (taille,)))
+    return {u : (t, tuple(c)) for u, (t, c) in solutions.items()}
+
+
+def solutionGrappe(hauteur, largeur, etats, tailles) :
+    '''
+    Retourne les solutions de la région fournie, voir _resoudreGrappe, les
+    comptes étant donnés par case de la région, ou None.
+    Les résultats sont mémorisés sur la forme canonique de la région, si bien
+    qu'une grappe déjà rencontrée, à une symétrie près, n'est plus résolue.
+    @param etats   : bytes des états des cases de la région ligne par ligne
+    @param tailles : tailles des bateaux restants
+    '''
+    forme, positions = _formeCanonique(hauteur, largeur, etats)
+    cle = forme + (tuple(sorted(tailles)),)
+    if cle not in _solutionsGrappes :
+        if len(_solutionsGrappes) >= _LIMITE_SOLUTIONS_GRAPPES :
+            del(_solutionsGrappes[next(iter(_solutionsGrappes))])
+        _solutionsGrappes[cle] = _resoudreGrappe(*cle)
+    solutions = _solutionsGrappes[cle]
+    if solutions is None :
+        return None
+    return {u : (t, [c[p] for p in positions])\
+            for u, (t, c) in solutions.items()}
+
+
+# Tables de transposition de la fin de partie, partagées par les ia d'une même
+# grille : (nbCases, bateauxAdjacents) -> {(touchées, dispositions) :
+# (espérance du nombre de tirs restants, cases l'atteignant)}
+_tablesFinales = {}
+_LIMITE_TABLE_FINALE = 200000
+# Nombre de dispositions au-delà duquel la fin de partie n'est pas résolue :
+# sur une grille 10x10, une résolution sans table dure au plus ~20 ms pour 8
+# dispositions, mais déjà ~70 ms pour 10 et ~600 ms pour 12
+_LIMITE_DISPOSITIONS_FINALE = 8
+_PRECISION_FINALE = 1e-9
+
+
+def enumererDispositions(tables, tailles, bloquees, touchees,
+                         bateauxAdjacents, limite) :
+    '''
+    Retourne le tuple trié des dispositions des bateaux restants cohérentes
+    avec les observations, chacune étant le tuple trié des masques de ses
+    bateaux, ou None s'il y en a plus que la limite fournie.
+    Les bateaux de même taille n'étant pas distingués, chaque disposition n'est
+    retournée qu'une fois.
+    @param tables   : TablesPlacements de la grille
+    @param tailles  : tailles des bateaux restants
+    @param bloquees : masque des cases ne pouvant contenir de bateau
+    @param touchees : masque des cases touchées devant toutes être couvertes,
+                      aucun bateau ne pouvant n'occuper que celles-ci (il
+                      aurait sinon été coulé)
+    '''
+    tailles = sorted(tailles, reverse=True)
+    permises = ~bloquees
+    fenetres = [[(m, h) for m, h in zip(tables.masques(t), tables.halos(t))\
+                 if not m & ~permises and m & ~touchees] for t in tailles]
+    dispositions = set()
+    # (index du bateau à placer, index de sa 1ère fenêtre possible, masques
+    # des bateaux placés, cases occupées, cases interdites)
+    pile = [(0, 0, (), 0, 0)]
+    while pile :
+        i, debut, masques, occupees, interdites = pile.pop()
+        if i == len(tailles) :
+            if not touchees & ~occupees :
+                dispositions.add(tuple(sorted(masques)))
+                if len(dispositions) > limite :
+                    return None
+            continue
+        # Cases touchées ne pouvant plus être couvertes par les bateaux restants
+        if bin(touchees & ~occupees).count('1') > sum(tailles[i:]) :
+            continue
+        for j in range(debut, len(fenetres[i])) :
+            masque, halo = fenetres[i][j]
+            if masque & interdites :
+                continue
+            # Un bateau suivant de même taille débute après celui-ci
+            suivant = j + 1 if i + 1 < len(tailles)\
+                               and tailles[i + 1] == tailles[i] else 0
+            pile.append((i + 1, suivant, masques + (masque,),
+                         occupees | masque,
+                         interdites | (masque if bateauxAdjacents else halo)))
+    return tuple(sorted(dispositions))
+
+
+def _issueFinale(disposition, touchees, bit) :
+    '''
+    Retourne le résultat du tir de la case du bit fourni pour une disposition
+    dont un bateau l'occupe : masque du bateau s'il est coulé, sinon -1.
+    '''
+    for masque in disposition :
+        if masque & bit :
+            return masque if masque & ~touchees == bit else -1
+
+
+def _esperanceFinale(touchees, dispositions, table) :
+    '''
+    Retourne (espérance minimale du nombre de tirs restant pour couler les
+    bateaux, tuple des cases l'atteignant) lorsque les dispositions fournies
+    sont équiprobables, en mémorisant dans la table chaque état résolu.
+    @param touchees     : masque des cases touchées des bateaux non coulés
+    @param dispositions : tuple trié des dispositions des bateaux non coulés
+    '''
+    cle = (touchees, dispositions)
+    resultat = table.get(cle)
+    if resultat is not None :
+        return resultat
+    if len(dispositions) == 1 :
+        # Disposition connue : chacune de ses cases non touchées sera tirée
+        cases = casesMasque(sum(dispositions[0]) & ~touchees)
+        return (len(cases), tuple(cases))
+    # Cases non touchées de chaque disposition, et nombre de dispositions
+    # occupant chacune de ces cases
+    restantes = [sum(d) & ~touchees for d in dispositions]
+    nombres = [bin(r).count('1') for r in restantes]
+    frequences = {}
+    for r in restantes :
+        while r :
+            bit = r & -r
+            frequences[bit] = frequences.get(bit, 0) + 1
+            r ^= bit
+    if not frequences :
+        # Bateaux restants tous coulés : plus aucun tir nécessaire
+        return (0, ())
+    total = len(dispositions)
+
+    # Une case occupée par toutes les dispositions avec le même résultat
+    # n'apporte aucune information : la tirer d'abord ne peut qu'enrichir les
+    # résultats des tirs suivants, elle est donc optimale (comme toute autre
+    # case de ce type), ce qui évite d'explorer leurs ordres de tir
+    forcees = []
+    for bit in sorted(frequences) :
+        if frequences[bit] == total :
+            issues = {_issueFinale(d, touchees, bit) for d in dispositions}
+            if len(issues) == 1 :
+                forcees.append((bit, issues.pop()))
+    if forcees :
+        bit, issue = forcees[0]
+        if issue == -1 :
+            t, ds = touchees | bit, dispositions
+        else :
+            t = touchees & ~issue
+            ds = tuple(sorted(tuple(m for m in d if m != issue)\
+                              for d in dispositions))
+        esperance = 1 + _esperanceFinale(t, ds, table)[0]
+        cases = [bit.bit_length() for bit, _ in forcees]
+        return _memoriserFinale(table, cle, esperance, cases)
+
+    meilleure, cases = None, []
+    for bit in sorted(frequences, key=lambda b : (-frequences[b], b)) :
+        # Répartition des dispositions selon le résultat du tir :
+        # 0 manqué, -1 touché, masque du bateau si coulé ; avec pour chaque
+        # résultat la somme des cases restant à tirer de ses dispositions,
+        # chacune devant l'être (minorant de l'espérance)
+        resultats, sommes = {}, {}
+        for d, r, n in zip(dispositions, restantes, nombres) :
+            if not r & bit :
+                resultats.setdefault(0, []).append(d)
+                sommes[0] = sommes.get(0, 0) + n
+                continue
+            issue = _issueFinale(d, touchees, bit)
+            resultats.setdefault(issue, []).append(d if issue == -1 else\
+                                    tuple(m for m in d if m != issue))
+            sommes[issue] = sommes.get(issue, 0) + n - 1
+        borne = 1 + sum(sommes.values()) / total
+        if meilleure is not None and borne > meilleure + _PRECISION_FINALE :
+            continue
+        esperance = 1
+        for issue, ds in resultats.items() :
+            if issue == 0 :
+                t = touchees
+            elif issue == -1 :
+                t = touchees | bit
+            else :
+                # Les dispositions ne sont plus triées une fois le bateau
+                # coulé retiré
+                t = touchees & ~issue
+                ds.sort()
+            esperance += len(ds) / total\
+                         * _esperanceFinale(t, tuple(ds), table)[0]
+            if meilleure is not None\
+               and esperance > meilleure + _PRECISION_FINALE :
+                break
+        case = bit.bit_length()
+        if meilleure is None or esperance < meilleure - _PRECISION_FINALE :
+            meilleure, cases = esperance, [case]
+        elif esperance <= meilleure + _PRECISION_FINALE :
+            cases.append(case)
+
+    return _memoriserFinale(table, cle, meilleure, cases)
+
+
+def _memoriserFinale(table, cle, esperance, cases) :
+    '''
+    Mémorise dans la table de transposition l'état résolu fourni, en retirant
+    si besoin le plus ancien, et le retourne.
+    '''
+    if len(table) >= _LIMITE_TABLE_FINALE :
+        del(table[next(iter(table))])
+    table[cle] = (esperance, tuple(cases))
+    return table[cle]
+
+
+def resoudreFinale(nbCases, bateauxAdjacents, touchees, dispositions) :
+    '''
+    Retourne (espérance minimale du nombre de tirs restant, cases l'atteignant)
+    pour les dispositions équiprobables fournies.
+    La table de transposition de la grille conserve les états résolus d'une
+    partie à l'autre. La résolution n'étant jamais abandonnée en cours de
+    route, son résultat ne dépend que des paramètres fournis, et non des
+    parties ou des copies d'ia (voir EtatIA) résolues auparavant : seul le
+    nombre de dispositions (voir _LIMITE_DISPOSITIONS_FINALE) décide de sa
+    tentative.
+    '''
+    table = _tablesFinales.setdefault((nbCases, bateauxAdjacents), {})
+    return _esperanceFinale(touchees, dispositions, table)
+
+
+
+def _poidsCarte(carte, nbCases, bateaux) :
+    '''
+    Retourne le poids de chaque case (index 0 inutilisé) d'après la carte des
+    flottes adverses : nombre de bateaux l'ayant occupée, lissé par le nombre
+    attendu si les bateaux étaient répartis uniformément, afin que l'a priori
+    ne s'impose qu'au fil des parties. None si la carte est vide ou absente.
+    '''
+    if carte is None or not carte.parties :
+        return None
+    uniforme = 1 + carte.parties * sum(bateaux) / nbCases ** 2
+    return [uniforme + n for n in carte.occupations()]
+
+
+def construireLivreOuvertures(nbCases, bateaux, profondeur, carte=None,
+                              hasard=None) :
+    '''
+    Construit et retourne le LivreOuvertures d'une grille : chaque tir est la
+    case ayant la plus forte probabilité d'être occupée sachant que les tirs
+    précédents ont été manqués, estimée par son nombre de positionnements des
+    bateaux, pondéré par la carte des flottes adverses si elle est fournie.
+    @param profondeur : nombre de tirs du livre
+    @param carte      : CarteFlottes de la grille
+    @param hasard     : générateur aléatoire ou graine départageant les cases
+                        ex aequo, voir libs.obtenirHasard
+    '''
+    hasard = obtenirHasard(hasard)
+    densite = donneesGrille(nbCases, bateaux).densite().copie()
+    poids = _poidsCarte(carte, nbCases, bateaux) or [1] * (nbCases ** 2 + 1)
+    cases = []
+    libres = set(range(1, nbCases ** 2 + 1))
+    for _ in range(min(profondeur, nbCases ** 2)) :
+        scores = dict((c, densite.comptes[c] * poids[c]) for c in libres)
+        maximum = max(scores.values())
+        case = hasard.choice(sorted(c for c, v in scores.items()\
+                                    if v == maximum))
+        cases.append(case)
+        libres.discard(case)
+        densite.bloquer(case)
+    return LivreOuvertures(nbCases, cases)
+
+
+def ecrireLivreOuvertures(idJeu, bateauxAdjacents, profondeur, repertoire=None,
+                          hasard=None) :
+    '''
+    Construit le livre d'ouvertures de la grille fournie d'après sa carte des
+    flottes adverses et l'enregistre, voir libs.livreOuvertures.
+    Retourne le LivreOuvertures enregistré.
+    @param idJeu : identifiant de la grille (voir libs.creerIdGrille)
+    '''
+    nbCases = int(idJeu[1:idJeu.find('b')])
+    bateaux = sorted([int(n) for n in idJeu[idJeu.find('b'):] if n.isdigit()],
+                     reverse=True)
+    livre = construireLivreOuvertures(nbCases, bateaux, profondeur,
+                                      carteFlottes(idJeu, nbCases,
+                                                   bateauxAdjacents,
+                                                   repertoire), hasard)
+    livre.enregistrer(fichierLivreOuvertures(idJeu, bateauxAdjacents,
+                                             repertoire))
+    return livre
+
+
 
 class IA :
     '''
     Joueur « virtuel » du jeu
     '''
-    def __init__(self, nbCases, bateaux, bateauxAdjacents=False) :
+    def __init__(self, nbCases, bateaux, bateauxAdjacents=False,
+                 strategie='zones', budget=0.5, echantillons=2000,
+                 processus=None, blocs=8, hasard=None, carte=None,
+                 livre=None) :
         '''
         @param nbCases          : nombre de cases du côté de la grille
         @param bateaux          : liste des tailles de bateaux, par exemple :
@@ -20,140 +843,289 @@ class IA :
         @param bateauxAdjacents : spécifie si les bateaux sur la grille sont
                                   autorisés à être juxtaposés les uns aux autres
                                   False par défaut
+        @param strategie        : stratégie de tirage, une des valeurs de
+                                  STRATEGIES, « zones » par défaut
+        @param budget           : (montecarlo) durée maximum en secondes du
+                                  tirage des dispositions à chaque tour, None
+                                  pour aucune limite (tirages reproductibles)
+        @param echantillons     : (montecarlo) nombre maximum de dispositions
+                                  tirées à chaque tour
+        @param processus        : (montecarlo) nombre de processus du pool
+                                  effectuant les tirages, 0 pour les effectuer
+                                  dans le processus courant, par défaut le
+                                  nombre de processeurs moins un
+        @param blocs            : (montecarlo) nombre de blocs de tirages,
+                                  chacun ayant sa propre graine, entre lesquels
+                                  sont réparties les dispositions à tirer
+        @param hasard           : générateur aléatoire ou graine de l'ia (voir
+                                  libs.obtenirHasard)
+        @param carte            : libs.CarteFlottes des flottes adverses des
+                                  parties précédentes, utilisée comme a priori
+                                  lors du choix des cases de recherche
+        @param livre            : libs.LivreOuvertures de la grille, dont les
+                                  tirs sont suivis jusqu'à la 1ère case touchée
         '''
+        if strategie not in STRATEGIES :
+            raise ValueError('stratégie « {} » inconnue, valeurs autorisées :'
+                             ' {}'.format(strategie, ', '.join(STRATEGIES)))
+        self._strategie = strategie
         self._nbCases = nbCases
         self._tailleMinimumBateau = min(bateaux)
+        self._bateaux = tuple(bateaux)
         self._taillesBateaux = bateaux.copy()
+        self._bateauxAdjacents = bateauxAdjacents
+        self._hasard = obtenirHasard(hasard)
 
-        self._casesTirees = set()
         self._exploitation = []
 
         self._mtb = False
         self._reportExclusion = False
 
-        y = 1
-        x = 1
-        self._cases = ([], [])
-        self._binaires = ([], [])
-        while x <= self._nbCases :
-            self._cases[0].append(tuple(range(y, y + self._nbCases)))
-            self._cases[1].append(tuple(range(x, x + (self._nbCases - 1)\
-                                                      * self._nbCases + 1,
-                                                  self._nbCases)))
-            self._binaires[0].append('0' * self._nbCases)
-            self._binaires[1].append('0' * self._nbCases)
-            y += self._nbCases
-            x += 1
-
-        posIndex = list(range(1, self._tailleMinimumBateau + 1))
-        shuffle(posIndex)
-        items = genItemListe(posIndex)
-
-        self._bateauxAdjacents = bateauxAdjacents
-        if bateauxAdjacents :
-            self._ChoisirCasesExploitation = self._ChoisirCasesExploitationBA
-        else :
+        # Masques constants de la grille, partagés par les ia de même grille
+        self._donnees = donneesGrille(nbCases, bateaux)
+        self._topologie = self._donnees.topologie
+        self._masqueGrille = self._donnees.masqueGrille
+        self._masqueLigne = self._donnees.masqueLigne
+        self._masquesColonnes = self._donnees.masquesColonnes
+        self._masqueSansColonneGauche = self._donnees.masqueSansColonneGauche
+        self._masqueSansColonneDroite = self._donnees.masqueSansColonneDroite
+        self._masquesHorsDebutsH = self._donnees.masquesHorsDebutsH
+
+        if not bateauxAdjacents :
             self.prochainTirages = []
-            self._ChoisirCasesExploitation = self._ChoisirCasesExploitationBNA
             # Cases de coins (hg, hd, bg, bd) à exclure si les bateaux ne
             # peuvent être côte à côte
-            self.casesCoins = (1, self._nbCases,
-                               self._nbCases ** 2 - self._nbCases + 1,
-                               self._nbCases ** 2)
-            self.casesDiagonaleCoins = (1 + self._nbCases + 1,
-                                        self._nbCases * 2 - 1,
-                                        self.casesCoins[2] - self._nbCases + 1,
-                                        self.casesCoins[3] - self._nbCases - 1)
+            self.casesCoins = self._donnees.casesCoins
+            self.casesDiagonaleCoins = self._donnees.casesDiagonaleCoins
+
+        if strategie == 'montecarlo' :
+            self._budget = budget
+            self._echantillons = echantillons
+            self._blocs = blocs
+            if processus is None :
+                processus = (os.cpu_count() or 1) - 1
+            self._processus = processus
+            if self._processus :
+                # Démarrage anticipé des processus
+                obtenirPool('ia', self._processus)
+
+        self._initialiserTirs()
+
+        posIndex = list(range(1, self._tailleMinimumBateau + 1))
+        self._hasard.shuffle(posIndex)
+        items = genItemListe(posIndex)
 
         # Cases de bases à tirer par l'ia
-        self._tirages = []
+        self._masqueTirages = 0
         index = 0
         y = 0
         case = 1
         while y < self._nbCases :
             index = next(items)
             while index <= self._nbCases :
-                self._tirages.append(index + y * self._nbCases)
+                self._masqueTirages |= 1 << (index + y * self._nbCases - 1)
                 index += self._tailleMinimumBateau
             y += 1
 
-        # Séparation de la grille en « zones » de 3 ou 4 cases afin que les tirs
-        # soient répartis plus ou moins uniformément sur la grille.
-        # Notamment pour éviter que les tirs soient trop ciblés sur les mêmes
-        # zones de la grille.
-        zones = []
-        # Taille de chaque zone doit valoir 3 ou 4
-        i = 0
-        while i < self._nbCases // 3 :
-            zones.append(3)
-            i += 1
-        # Ajout des reliquats
-        reste = self._nbCases % 3
-        i = 0
-        while i < reste :
-            zones[i] += 1
-            i += 1
+        self._initialiserStrategie()
+
+        # Poids des cases lors des tirages de recherche : nombre de bateaux
+        # adverses les ayant occupées, lissé par le nombre attendu si les
+        # bateaux étaient répartis uniformément, afin que l'a priori ne
+        # s'impose qu'au fil des parties.
+        self._poidsRecherche = _poidsCarte(carte, nbCases, bateaux)
+        self._livre = livre
 
-        # De ces zones, on construit les listes des numéros de case qu'elles
-        # contiennent.
-        # Et par soucis de facilité/perfs, création d'une seconde liste
-        # indiquant le ratio taille/contenance qui sera recalculé losqu'une de
-        # ces cases sera tirée (supprimée)
-        i = 0
-        xi = 0
-        yi = 1
-        n = 1
-        self._zonesCases = []
-        self._zonesCasesRatio = []
-        for y in zones :
-            for x in zones :
-                self._zonesCases.append([])
-                self._zonesCasesRatio.append({})
-                z = n
-                zx = z + x
-                while z < zx :
-                    # On ne prend que les valeurs contenues dans self._tirages
-                    cz = list(set(self._tirages)\
-                              & set(range(z, n +nbCases*y, nbCases)))
-                    self._zonesCases[i].extend(cz)
-                    z += 1
-                # Total des cases de la zone
-                self._zonesCasesRatio[i]['taille'] = x * y
-                # Nombre de cases pouvant être exploitées contenues dans la zone
-                self._zonesCasesRatio[i]['nombre'] = len(self._zonesCases[i])
-                # Ratio des 2
-                self._zonesCasesRatio[i]['ratio'] = len(self._zonesCases[i])\
-                                                       / (x * y)
-                n += x
-                i += 1
-            n += (y-1) * nbCases
-
-        self._tirerCase = self._zcTirerCase
-        self._actualiserTirages = self._zcActualiserTirages
-        
         self.journal = Journalisation(fichier=config.fichierLogIA)
+        self.decisions = JournalDecisions(config.fichierDecisionsIA)
+        self._tour = 0
+        self._echeance = None
+        # Compteur incrémenté à chaque changement d'état, le tir anticipé
+        # (version, case, EtatIA après le tir) n'étant valable que pour la
+        # version à laquelle il a été calculé
+        self._version = 0
+        self._anticipation = None
+
+    def _initialiserTirs(self) :
+        ''' Méthode interne '''
+        ''' Initialise l'état des tirs d'une grille vierge '''
+        # État des tirs sous forme de masques binaires (entiers) :
+        # - un masque global où le bit case - 1 est à 1 si la case a été tirée
+        # - un masque par ligne et un par colonne (bit i à 1 si la i-ème case de
+        #   la ligne / colonne a été tirée)
+        self._masqueTirees = 0
+        self._binaires = ([0] * self._nbCases, [0] * self._nbCases)
+
+        # Index des séquences de cases non tirées : pour chaque ligne (axe 0)
+        # et colonne (axe 1) un dict index de début -> taille de la séquence et
+        # un dict index de fin -> index de début, ainsi que les séquences
+        # (axe, ligne, début) regroupées par taille.
+        # Un tir coupe au plus une séquence par axe en deux.
+        self._segments = ([{0:self._nbCases} for _ in range(self._nbCases)],
+                          [{0:self._nbCases} for _ in range(self._nbCases)])
+        self._finsSegments = ([{self._nbCases - 1:0}\
+                               for _ in range(self._nbCases)],
+                              [{self._nbCases - 1:0}\
+                               for _ in range(self._nbCases)])
+        self._seauxSegments = {self._nbCases:set((axe, ligne, 0)\
+                                                 for axe in (0, 1)\
+                                                 for ligne in\
+                                                 range(self._nbCases))}
+
+    def _initialiserStrategie(self) :
+        ''' Méthode interne '''
+        '''
+        Associe les méthodes de tirage de la stratégie et construit ses
+        structures à partir des tirages de base, les cases tirées devant être
+        ensuite fournies à _actualiserTirages.
+        '''
+        if self._bateauxAdjacents :
+            self._ChoisirCasesExploitation = self._ChoisirCasesExploitationBA
+        else :
+            self._ChoisirCasesExploitation = self._ChoisirCasesExploitationBNA
 
+        self._densite = None
+        if self._strategie in ('densite', 'montecarlo') :
+            self._densite = self._donnees.densite().copie()
+            self._tirerCase = self._densiteTirerCase
+            self._actualiserTirages = self._densiteActualiserTirages
+            self._ChoisirCasesExploitation =\
+                                        self._densiteChoisirCasesExploitation
+            if self._strategie == 'montecarlo' :
+                self._ChoisirCasesExploitation =\
+                                        self._mcChoisirCasesExploitation
+        elif self._mtb :
+            self._tirerCase = self._binTirerCase
+            self._actualiserTirages = self._actualiserGeneriques
+        else :
+            self._zcInitialiser()
+            self._tirerCase = self._zcTirerCase
+            self._actualiserTirages = self._zcActualiserTirages
 
-    def tirer(self) :
+    def snapshot(self) :
+        '''
+        Retourne l'état complet de l'ia sous la forme d'un EtatIA immuable,
+        permettant de la restaurer ultérieurement via restore.
+        '''
+        return EtatIA(self._nbCases, self._bateaux, self._bateauxAdjacents,
+                      self._strategie, self._mtb, self._masqueTirees,
+                      self._masqueTirages, tuple(self._exploitation),
+                      tuple(self._taillesBateaux), self._tailleMinimumBateau,
+                      self._reportExclusion,
+                      tuple(getattr(self, 'prochainTirages', ())),
+                      self._tour, self._hasard.getstate())
+
+    def restore(self, etat) :
+        '''
+        Restaure l'état de l'ia à partir d'un EtatIA retourné par snapshot, les
+        structures dérivées étant reconstruites (la table des densités à partir
+        des cases tirées et des bateaux restants).
+        @param etat : EtatIA d'une ia de même grille (nombre de cases, bateaux
+                      et juxtaposition)
+        '''
+        if (etat.nbCases, etat.bateaux, etat.bateauxAdjacents) !=\
+           (self._nbCases, self._bateaux, self._bateauxAdjacents) :
+            raise ValueError('L\'état fourni ne correspond pas à la grille de'
+                             ' l\'ia')
+        if etat.strategie == 'montecarlo' and not hasattr(self, '_budget') :
+            raise ValueError('L\'ia n\'a pas été créée avec la stratégie'
+                             ' montecarlo')
+        self._strategie = etat.strategie
+        self._mtb = etat.mtb
+        self._exploitation = list(etat.exploitation)
+        self._taillesBateaux = list(etat.taillesBateaux)
+        self._tailleMinimumBateau = etat.tailleMinimumBateau
+        self._reportExclusion = etat.reportExclusion
+        if not self._bateauxAdjacents :
+            self.prochainTirages = list(etat.prochainTirages)
+        self._tour = etat.tour
+        self._hasard.setstate(etat.hasard)
+        self._version += 1
+
+        self._masqueTirages = etat.tirages
+        self._initialiserTirs()
+        self._initialiserStrategie()
+        if self._densite :
+            # Table reconstruite d'un bloc : cases tirées, puis couches des
+            # bateaux coulés
+            self._densite.bloquerMasque(etat.tirees)
+            restants = list(self._taillesBateaux)
+            for taille in self._bateaux :
+                if taille in restants :
+                    restants.remove(taille)
+                else :
+                    self._densite.supprimerBateau(taille)
+            self._actualiserGeneriques(*self._casesMasque(etat.tirees))
+        else :
+            self._actualiserTirages(*self._casesMasque(etat.tirees))
+
+
+    def tirer(self, echeance=None) :
         '''
         Tire et retourne une case au hasard ou une case parmi celles ciblées
         selon les indications fournies préalablement via la méthode
         explorerAutour.
+        @param echeance : time() avant lequel la case doit être retournée ; les
+                          stratégies affinant leur choix dans le temps
+                          (montecarlo) l'utilisent jusqu'à cette échéance et
+                          retournent la meilleure case trouvée, les autres
+                          l'ignorent.
         '''
+        anticipation, self._anticipation = self._anticipation, None
+        if anticipation is not None and anticipation[0] == self._version :
+            self.restore(anticipation[2])
+            return anticipation[1]
         n = 0
+        self._version += 1
+        self._tour += 1
+        self._echeance = echeance
         try :
-            if self._exploitation :
+            if self._livre is not None and not self._exploitation :
+                n = self._livre.suivante(self._masqueTirees)
+                if n :
+                    self.decisions.enregistrer(self._tour, 'ouverture', (n,),
+                                               n)
+            if not n :
+                n = self._finaleTirerCase()
+            if not n and self._exploitation :
                 n = self._ChoisirCasesExploitation()
             if not n :
                 n = self._tirerCase()
             self._actualiserTirages(n)
         except Exception as e :
             self.journal.debug('%s %s', type(e), e)
+            self.decisions.vider()
             raise type(e)(e)
-        self.journal.info('IA tire en %s', n)
         return n
 
 
+    def anticiper(self, echeance=None) :
+        '''
+        Calcule à l'avance le prochain tir sur l'état actuel, qui est ensuite
+        restauré : tirer retournera directement ce tir tant que l'état de l'ia
+        n'a pas changé entre temps.
+        Les décisions du tir anticipé sont enregistrées lors de son calcul.
+        @param echeance : voir tirer
+        '''
+        version = self._version
+        etat = self.snapshot()
+        try :
+            case = self.tirer(echeance)
+            apres = self.snapshot()
+        finally :
+            self.restore(etat)
+            self._version = version
+        self._anticipation = (version, case, apres)
+
+
+    def terminer(self) :
+        '''
+        Enregistre les décisions de l'ia restant en mémoire, à appeler en fin
+        de partie.
+        '''
+        self.decisions.fermer()
+
+
     def explorerAutour(self, case) :
         '''
         Méthode pour indiquer à l'ia qu'il faut explorer autour de la case
@@ -161,14 +1133,12 @@ class IA :
         Cette méthode est à appeler dès lors qu'une case bateau adverse est
         touchée.
         '''
-        self.journal.info('Touchée en %s', case)
-        self.journal.info('Explore autour %s', case)
+        self._version += 1
+        self.decisions.enregistrer(self._tour, 'touchee', (case,), 0)
         if case in self._exploitation :
-            self.journal.debug('Case déjà marquée à exploiter')
             raise ValueError('La case {} a déjà été marquée comme étant à'
                              ' exploiter'.format(case))
         self._exploitation.append(case)
-        self.journal.info('Exploitation cases %s', self._exploitation)
 
 
     def supprimerCases(self, *cases) :
@@ -176,11 +1146,12 @@ class IA :
         Supprime la ou les cases fournies des cases pouvant être tirées par l'ia
         @param cases : entier(s)
         '''
+        self._version += 1
         cases = list(cases)
-        self.journal.info('Suppression cases %s', cases)
+        self.decisions.enregistrer(self._tour, 'suppression', cases, 0)
         if not self._bateauxAdjacents :
             for c, v in enumerate(self.casesDiagonaleCoins) :
-                if v in cases and self.casesCoins[c] not in self._casesTirees :
+                if v in cases and not self._estTiree(self.casesCoins[c]) :
                     cases.append(self.casesDiagonaleCoins[c])
         self._actualiserTirages(*cases)
 
@@ -195,12 +1166,11 @@ class IA :
         Cette méthode est à appeler impérativement chaque fois qu'un bateau
         adverse est coulé.
         '''
-        self.journal.info('Touché, coulé du bateau sur les cases'
-                          ' %s, suppression du bateau', cases)
+        self._version += 1
+        self.decisions.enregistrer(self._tour, 'coule', cases, 0)
         try :
             self._taillesBateaux.remove(len(cases))
         except ValueError :
-            self.journal.debug('Longueur bateau inexistante %s', cases)
             raise ValueError('Le bateau à supprimer n\'existe pas ou plus,'
                              'les cases {} indiquées sont incorrectes'\
                              .format(cases))
@@ -211,26 +1181,25 @@ class IA :
             except ValueError :
                 continue
 
+        if self._densite :
+            self._densite.supprimerBateau(len(cases))
+
         if not self._bateauxAdjacents :
-            self.journal.info('vide prochain tirages')
             self.prochainTirages.clear()
 
-        # Dès le 1er bateau coulé, la méthode de tir passe en mode sur appui
-        # binaire
-        if not self._mtb :
-            self.journal.info('Changement méthode tirage')
-            self._actualiserBinaires(*self._casesTirees)
-            del(self._zonesCases, self._zonesCasesRatio)
+        # Dès le 1er bateau coulé, la méthode de tir par zones passe en mode
+        # sur appui binaire
+        if not self._mtb and self._strategie == 'zones' :
+            del(self._zonesCases, self._zonesCasesRatio, self._zoneCase,
+                self._zonesSeaux, self._zonesTas)
             self._tirerCase = self._binTirerCase
-            self._actualiserTirages = self._binActualiserTirages
+            self._actualiserTirages = self._actualiserGeneriques
             self._mtb = True
 
         if not self._exploitation and self._reportExclusion :
-            self.journal.info('Effectue report exclusion')
             self._exclureSequencesBinaires()
 
         if min(self._taillesBateaux) > self._tailleMinimumBateau :
-            self.journal.info('Taille min bateau change')
             self._tailleMinimumBateau = min(self._taillesBateaux)
             if not self._exploitation :
                 self._exclureSequencesBinaires()
@@ -238,7 +1207,6 @@ class IA :
                 # Il y a encore des bateaux à trouver (bateaux pouvant être
                 # juxtaposés), donc les exclusions de séquences trop petites ne
                 # peut être effectuées tout de suite
-                self.journal.info('Report des exclusions')
                 self._reportExclusion = True
 
 
@@ -249,11 +1217,100 @@ class IA :
         attributs de la classe selon les n° de cases fournis en paramètre.
         '''
         for n in cases :
-            try :
-                self._tirages.remove(n)
-            except ValueError :
+            bit = 1 << (n - 1)
+            if self._masqueTirees & bit :
                 continue
-        self._casesTirees |= set(cases)
+            self._masqueTirees |= bit
+            ligne, colonne = divmod(n - 1, self._nbCases)
+            self._couperSegment(0, ligne, colonne)
+            self._couperSegment(1, colonne, ligne)
+            self._binaires[0][ligne] |= 1 << colonne
+            self._binaires[1][colonne] |= 1 << ligne
+            if self._masqueTirages & bit :
+                self._masqueTirages ^= bit
+
+    def _couperSegment(self, axe, ligne, position) :
+        ''' Méthode interne '''
+        '''
+        Coupe la séquence de cases non tirées contenant la position fournie de
+        la ligne (axe 0) ou colonne (axe 1), avant sa prise en compte dans les
+        binaires.
+        '''
+        # Le début de la séquence suit la dernière case tirée avant la position
+        debut = (self._binaires[axe][ligne] & ((1 << position) - 1))\
+                .bit_length()
+        segments = self._segments[axe][ligne]
+        fins = self._finsSegments[axe][ligne]
+        taille = segments.pop(debut)
+        del(fins[debut + taille - 1])
+        self._retirerSeau(taille, (axe, ligne, debut))
+        for d, t in ((debut, position - debut),
+                     (position + 1, debut + taille - position - 1)) :
+            if t :
+                segments[d] = t
+                fins[d + t - 1] = d
+                self._seauxSegments.setdefault(t, set()).add((axe, ligne, d))
+
+    def _retirerSeau(self, taille, segment) :
+        ''' Méthode interne '''
+        ''' Retire une séquence de son seau, supprimé s'il devient vide '''
+        seau = self._seauxSegments[taille]
+        seau.discard(segment)
+        if not seau :
+            del(self._seauxSegments[taille])
+
+    def _choisirParmi(self, phase, candidats) :
+        ''' Méthode interne '''
+        '''
+        Retourne une case tirée au hasard parmi les candidates fournies et
+        enregistre la décision dans le journal des décisions.
+        En recherche, les cases sont pondérées par la carte des flottes
+        adverses si elle a été fournie.
+        @param phase : phase de jeu ayant fourni les candidates
+        '''
+        if phase == 'recherche' and self._poidsRecherche :
+            case = self._hasard.choices(candidats,
+                                        [self._poidsRecherche[c]\
+                                         for c in candidats])[0]
+        else :
+            case = self._hasard.choice(candidats)
+        self.decisions.enregistrer(self._tour, phase, candidats, case)
+        return case
+
+    def _estTiree(self, case) :
+        ''' Méthode interne '''
+        ''' Retourne True si la case fournie a déjà été tirée '''
+        return bool(self._masqueTirees >> (case - 1) & 1)
+
+    def _casesMasque(self, masque) :
+        ''' Méthode interne '''
+        ''' Retourne la liste des numéros de cases des bits à 1 du masque '''
+        cases = []
+        while masque :
+            bit = masque & -masque
+            cases.append(bit.bit_length())
+            masque ^= bit
+        return cases
+
+    def _voisinesMasque(self, masque) :
+        ''' Méthode interne '''
+        '''
+        Retourne le masque des cases adjacentes (haut, bas, gauche, droite) aux
+        cases du masque fourni.
+        '''
+        return self._topologie.voisinesMasque(masque)
+
+    def _masqueSegment(self, axe, ligne, debut, fin) :
+        ''' Méthode interne '''
+        '''
+        Retourne le masque global des cases de la ligne (axe 0) ou colonne
+        (axe 1) comprises entre les index debut (inclus) et fin (exclus).
+        '''
+        if axe == 0 :
+            return ((1 << (fin - debut)) - 1) << (ligne * self._nbCases + debut)
+        return self._masquesColonnes[ligne]\
+               & ((1 << (fin - debut) * self._nbCases) - 1)\
+               << (debut * self._nbCases)
 
     def _espaceDisponible(self, case, axe) :
         ''' Méthode interne '''
@@ -265,42 +1322,25 @@ class IA :
                       doit être recherché.
         @param axe  : axe de recherche « horizontal » ou « vertical »
         '''
-        cases = self._casesTirees - set([case])
-        i = 1
+        ligne, colonne = divmod(case - 1, self._nbCases)
         if axe == 'horizontal' :
-            bg, bd = bornesGrille(case, self._nbCases)
-            if case > bg :
-                n = case - 1
-                while n >= bg :
-                    if n in cases :
-                        break
-                    i += 1
-                    n -= 1
-            if case < bd :
-                n = case + 1
-                while n <= bd :
-                    if n in cases :
-                        break
-                    i += 1
-                    n += 1
+            axe, position = 0, colonne
         elif axe == 'vertical' :
-            if case > self._nbCases :
-                n = case - self._nbCases
-                while n >= 1 :
-                    if n in cases :
-                        break
-                    i += 1
-                    n -= self._nbCases
-            if case <= self._nbCases * (self._nbCases-1) :
-                n = case + self._nbCases
-                while n <= self._nbCases ** 2 :
-                    if n in cases :
-                        break
-                    i += 1
-                    n += self._nbCases
+            axe, ligne, position = 1, colonne, ligne
         else :
             raise ValueError('paramètre axe doit être « horizontal » ou'
                              ' « vertical », fourni : {}'.format(axe))
+        segments = self._segments[axe][ligne]
+        if not self._binaires[axe][ligne] >> position & 1 :
+            # Case non tirée, l'espace est la séquence qui la contient
+            debut = (self._binaires[axe][ligne] & ((1 << position) - 1))\
+                    .bit_length()
+            return segments[debut] >= self._tailleMinimumBateau
+        # Case tirée, l'espace est la case et les séquences qui l'encadrent
+        i = 1 + segments.get(position + 1, 0)
+        debut = self._finsSegments[axe][ligne].get(position - 1)
+        if debut is not None :
+            i += segments[debut]
         return i >= self._tailleMinimumBateau
 
 
@@ -317,23 +1357,18 @@ class IA :
         @param cases : cases représentant les voisines immédiates d'une case
         cible (1 à 4 cases).
         '''
-        self.journal.debug('Choisit cases %s', cases)
-        self.journal.debug('Exploitation %s', self._exploitation)
         possibilites = []
         if len(self._exploitation) > 1 :
             if self._exploitation[-1] + 1 in self._exploitation\
                 or self._exploitation[-1] - 1 in self._exploitation :
                 pas = 1
-                borne1, borne2 = bornesGrille(self._exploitation[-1],
-                                              self._nbCases)
-                self.journal.debug('Pas établit à 1')
+                borne1, borne2 =\
+                                self._topologie.bornes[self._exploitation[-1]]
             elif self._exploitation[-1] + self._nbCases in self._exploitation\
                or self._exploitation[-1] - self._nbCases in self._exploitation :
                 pas = self._nbCases
                 borne1, borne2 = 1, self._nbCases**2
-                self.journal.debug('Pas établit à %s', self._nbCases)
             else :
-                self.journal.debug('Pas indéterminé...')
                 return self._choisirCaseSelonAxe(cases)
 
             cmin, cmax = None, None
@@ -347,16 +1382,13 @@ class IA :
             # Si seulement min ou max, complément avec la dernière case de la
             # liste
             if not cmin and cmax :
-                self.journal.debug('not cmin, cmax : %s', cmax)
                 cmin = self._exploitation[-1]
             elif not cmax and cmin :
-                self.journal.debug('not cmax, cmin : %s', cmin)
                 cmax = self._exploitation[-1]
                 
             possibilitesTemporaires = []
 
             if not cmin and not cmax :
-                self.journal.debug('not cmin, not cmax')
                 # Les 2 extrémités d'un même axe n'ayant rien donné, ce qui
                 # implique que ce sont des bateaux différents qui ont été
                 # touchés auparavant, retour sur la dernière case de la liste
@@ -379,13 +1411,11 @@ class IA :
                 elif self._exploitation[-1] + pas <= borne2 :
                     possibilitesTemporaires.append(self._exploitation[-1] + pas)
             possibilites.extend([n for n in possibilitesTemporaires\
-                                 if n not in self._casesTirees])
+                                 if not self._estTiree(n)])
         if not possibilites :
-            self.journal.debug('Aucune possibilité')
             return self._choisirCaseSelonAxe(cases)
         else :
-            self.journal.debug('Possibiltés : %s', possibilites)
-            return choice(possibilites)
+            return self._choisirParmi('exploitation', possibilites)
 
 
     def _choisirCaseSelonAxe(self, cases) :
@@ -397,12 +1427,10 @@ class IA :
         @param cases : cases représentant les voisines IMMÉDIATES d'une case
         cible (1 à 4 cases)
         '''
-        self.journal.debug('Selon axe %s', cases)
         possibilites = []
         if len(cases) != 3 :
             possibilites.extend(cases)
         else :
-            self.journal.debug('3 cases')
             # Différence entre 2 cases opposées des cases
             for n in (2, self._nbCases * 2) :
                 # nota bene : cases[0] - n peut être négatif, mais cela n'a
@@ -418,8 +1446,7 @@ class IA :
             # c'est que sont la 2ème et 3ème qui le sont.
             if not possibilites :
                 possibilites.extend(cases[1:])
-        self.journal.debug('Possibilités %s', possibilites)
-        return choice(possibilites)
+        return self._choisirParmi('axe', possibilites)
 
 
     def _ChoisirCasesExploitationBA(self) :
@@ -430,6 +1457,9 @@ class IA :
         l'une à côté de l'autre n'appartiennent pas obligatoirement au même
         bateau.
         '''
+        case = self._grappesChoisirCase()
+        if case :
+            return case
         vert, hor = True, True
         if len(self._exploitation) == 1 :
             hor = self._espaceDisponible(self._exploitation[0], 'horizontal')
@@ -438,24 +1468,172 @@ class IA :
         for case in self._exploitation[::-1] :
             possibilites = []
             if hor :
-                bg, bd = bornesGrille(case, self._nbCases)
-                if case - 1 >= bg and case - 1 not in self._casesTirees :
+                bg, bd = self._topologie.bornes[case]
+                if case - 1 >= bg and not self._estTiree(case - 1) :
                     possibilites.append(case - 1)
-                if case + 1 <= bd and case + 1 not in self._casesTirees :
+                if case + 1 <= bd and not self._estTiree(case + 1) :
                     possibilites.append(case + 1)
             if vert :
                 if case - self._nbCases > 0\
-                    and case -self._nbCases not in self._casesTirees :
+                    and not self._estTiree(case - self._nbCases) :
                     possibilites.append(case - self._nbCases)
                 if case + self._nbCases <= self._nbCases ** 2\
-                    and case +self._nbCases not in self._casesTirees :
+                    and not self._estTiree(case + self._nbCases) :
                     possibilites.append(case + self._nbCases)
             if not possibilites :
                 continue
-            self.journal.debug('Possibilites %s', possibilites)
             return self._choisirCase(possibilites)
 
 
+    def _grappes(self) :
+        ''' Méthode interne '''
+        '''
+        Retourne les grappes de cases à exploiter, 2 cases appartenant à la même
+        grappe dès lors qu'un même bateau restant peut les couvrir toutes deux
+        (même ligne ou colonne, sans case tirée entre elles).
+        '''
+        grappes = [[c] for c in self._exploitation]
+        portee = max(self._taillesBateaux)
+        fusion = True
+        while fusion :
+            fusion = False
+            for i in range(len(grappes)) :
+                for j in range(i + 1, len(grappes)) :
+                    if any(self._memeBateauPossible(a, b, portee)\
+                           for a in grappes[i] for b in grappes[j]) :
+                        grappes[i].extend(grappes.pop(j))
+                        fusion = True
+                        break
+                if fusion :
+                    break
+        return grappes
+
+    def _memeBateauPossible(self, a, b, portee) :
+        ''' Méthode interne '''
+        '''
+        Retourne True si les cases a et b peuvent appartenir à un bateau de
+        taille portee au plus.
+        '''
+        (la, ca), (lb, cb) = divmod(a - 1, self._nbCases),\
+                             divmod(b - 1, self._nbCases)
+        if la == lb and abs(ca - cb) < portee :
+            pas = 1
+        elif ca == cb and abs(la - lb) < portee :
+            pas = self._nbCases
+        else :
+            return False
+        for c in range(min(a, b) + pas, max(a, b), pas) :
+            if self._estTiree(c) and c not in self._exploitation :
+                return False
+        return True
+
+    def _grappesChoisirCase(self) :
+        ''' Méthode interne '''
+        '''
+        Résout chaque grappe de cases à exploiter en dénombrant les affectations
+        de ses cases touchées aux bateaux restants, et retourne une case libre
+        occupée par la plus grande proportion d'affectations, ou None si une
+        grappe n'a pu être résolue.
+        Une affectation est d'autant moins probable qu'elle utilise de bateaux,
+        chacun pouvant sinon se trouver sur l'un de ses positionnements libres
+        de la grille : son poids est l'inverse du produit de leurs nombres.
+        '''
+        portee = max(self._taillesBateaux) - 1
+        positionnements = self._nombresPositionnements()
+        meilleures, proportion = [], 0
+        for grappe in self._grappes() :
+            lignes = [(c - 1) // self._nbCases for c in grappe]
+            colonnes = [(c - 1) % self._nbCases for c in grappe]
+            l0 = max(0, min(lignes) - portee)
+            l1 = min(self._nbCases, max(lignes) + portee + 1)
+            c0 = max(0, min(colonnes) - portee)
+            c1 = min(self._nbCases, max(colonnes) + portee + 1)
+            cases = [l * self._nbCases + c + 1 for l in range(l0, l1)\
+                                               for c in range(c0, c1)]
+            etats = bytes(TOUCHEE if c in grappe else\
+                          BLOQUEE if self._estTiree(c) else LIBRE\
+                          for c in cases)
+            solutions = solutionGrappe(l1 - l0, c1 - c0, etats,
+                                       self._taillesBateaux)
+            if not solutions :
+                return None
+            total, poids = 0, [0] * len(cases)
+            for utilises, (nombre, comptes) in solutions.items() :
+                p = 1
+                for taille in utilises :
+                    p /= max(1, positionnements[taille])
+                total += nombre * p
+                for i, compte in enumerate(comptes) :
+                    poids[i] += compte * p
+            for case, p in zip(cases, poids) :
+                if not p :
+                    continue
+                if p / total > proportion :
+                    meilleures, proportion = [case], p / total
+                elif p / total == proportion :
+                    meilleures.append(case)
+        if not meilleures :
+            return None
+        return self._choisirParmi('grappe', meilleures)
+
+
+    def _nombresPositionnements(self) :
+        ''' Méthode interne '''
+        '''
+        Retourne un dict taille -> nombre de positionnements de la grille
+        n'occupant aucune case tirée hors des cases à exploiter.
+        '''
+        exploitation = 0
+        for c in self._exploitation :
+            exploitation |= 1 << (c - 1)
+        permises = self._masqueGrille & ~(self._masqueTirees & ~exploitation)
+        nombres = {}
+        for taille in set(self._taillesBateaux) :
+            h, v = permises, permises
+            for k in range(1, taille) :
+                h &= permises >> k
+                v &= permises >> (k * self._nbCases)
+            h &= ~self._masquesHorsDebutsH[taille]
+            nombres[taille] = bin(h).count('1')
+            if taille > 1 :
+                nombres[taille] += bin(v).count('1')
+        return nombres
+
+
+    def _finaleTirerCase(self) :
+        ''' Méthode interne '''
+        '''
+        Lorsque les dispositions possibles des bateaux restants sont assez peu
+        nombreuses, retourne une case minimisant l'espérance exacte du nombre
+        de tirs restant, sinon None.
+        '''
+        positionnements = self._nombresPositionnements()
+        produit = 1
+        for taille in self._taillesBateaux :
+            produit *= positionnements[taille]
+            if produit > _LIMITE_DISPOSITIONS_FINALE ** 2 :
+                return None
+        touchees = 0
+        for case in self._exploitation :
+            touchees |= 1 << (case - 1)
+        dispositions = enumererDispositions(
+                            tablesPlacements(self._nbCases, self._bateaux,
+                                             getattr(config,
+                                                     'repertoireDonnees',
+                                                     None)),
+                            self._taillesBateaux,
+                            self._masqueTirees & ~touchees, touchees,
+                            self._bateauxAdjacents,
+                            _LIMITE_DISPOSITIONS_FINALE)
+        if not dispositions :
+            return None
+        resultat = resoudreFinale(self._nbCases, self._bateauxAdjacents,
+                                  touchees, dispositions)
+        if not resultat[1] :
+            return None
+        return self._choisirParmi('finale', list(resultat[1]))
+
+
     def _ChoisirCasesExploitationBNA(self) :
         ''' Méthode interne '''
         '''
@@ -472,7 +1650,7 @@ class IA :
                 # En horizontal donc :
                 # tirage sur min - 1 ou max + 1
                 # si possible selon les bornes g/d de la grille
-                bg, bd = bornesGrille(max(self._exploitation), self._nbCases)
+                bg, bd = self._topologie.bornes[max(self._exploitation)]
                 if min(self._exploitation) - 1 >= bg :
                     self.prochainTirages.append(min(self._exploitation) - 1)
                 if max(self._exploitation) + 1 <= bd :
@@ -488,7 +1666,7 @@ class IA :
         else :
             if not self.prochainTirages :
                 if self._espaceDisponible(self._exploitation[0], 'horizontal') :
-                    bg, bd = bornesGrille(self._exploitation[0], self._nbCases)
+                    bg, bd = self._topologie.bornes[self._exploitation[0]]
                     if self._exploitation[0] - 1 >= bg :
                         self.prochainTirages.append(self._exploitation[0] - 1)
                     if self._exploitation[0] + 1 <= bd :
@@ -502,69 +1680,181 @@ class IA :
                         self.prochainTirages.append(self._exploitation[0]\
                                                     + self._nbCases)
         # Exclusion des cases déjà tirées
-        self.prochainTirages = list(set(self.prochainTirages)\
-                                    - self._casesTirees)
+        self.prochainTirages = [n for n in set(self.prochainTirages)\
+                                if not self._estTiree(n)]
         case = self._choisirCaseSelonAxe(self.prochainTirages)
         self.prochainTirages.remove(case)
         return case
 
-    def _actualiserBinaires(self, *cases) :
-        ''' Méthode Interne '''
-        ''' Met à jour les listes binaires en fonction des cases tirées '''
-        for l, c in enumerate(self._cases[0]) :
-            for i, case in enumerate(c) :
-                if case in cases :
-                    self._binaires[0][l] = self._binaires[0][l][:i]\
-                                        + '1' + self._binaires[0][l][i+1:]
-
-        for l, c in enumerate(self._cases[1]) :
-            for i, case in enumerate(c) :
-                if case in cases :
-                    self._binaires[1][l] = self._binaires[1][l][:i] + '1'\
-                                        + self._binaires[1][l][i+1:]
+    def _densiteCompteur(self, touchees=0) :
+        ''' Méthode interne '''
+        '''
+        Retourne le compteur tranché du nombre de positionnements des bateaux
+        restants passant par chaque case de la grille.
+        Un positionnement ne peut occuper que des cases non tirées ou touchées
+        sans que le bateau n'ait été coulé.
+        Si des cases touchées sont fournies, seuls les positionnements passant
+        par au moins l'une d'elles sont comptés, et ce autant de fois qu'ils en
+        contiennent.
+        @param touchees : masque des cases touchées à exploiter
+        '''
+        permises = ~self._masqueTirees & self._masqueGrille | touchees
+        compteur = []
+        for taille in set(self._taillesBateaux) :
+            nombre = self._taillesBateaux.count(taille)
+            # Débuts des positionnements horizontaux (pas de 1) et verticaux
+            # (pas de nbCases) : fenêtres glissantes de la taille du bateau
+            for pas, debuts in ((1, permises\
+                                 & ~self._masquesHorsDebutsH[taille]),
+                                (self._nbCases, permises)) :
+                i = 1
+                while i < taille :
+                    debuts &= permises >> i * pas
+                    i += 1
+                if touchees :
+                    poids = []
+                    i = 0
+                    while i < taille :
+                        _ajouterTranches(poids, [debuts & touchees >> i * pas])
+                        i += 1
+                else :
+                    poids = [debuts]
+                poids = _multiplierTranches(poids, nombre)
+                # Report du poids de chaque positionnement sur ses cases
+                i = 0
+                while i < taille :
+                    _ajouterTranches(compteur, [p << i * pas for p in poids])
+                    i += 1
+        return compteur
 
-    def _exclureSequencesBinaires(self) :
+    def _densiteTirerCase(self) :
         ''' Méthode interne '''
         '''
-        Met à 1 toutes les séquences de 0 inférieures à tailleMinimumBateau
-        dans les listes binaires.
+        Retourne une case parmi celles pouvant contenir le plus de
+        positionnements des bateaux restants.
         '''
-        lh, lv = set(), set()
-        for ligne, sbin in enumerate(self._binaires[0]) :
-            for seq in re.finditer('(?<!0)0{,'\
-                    + str(self._tailleMinimumBateau-1) + '}?(?!0)', sbin) :
-                for i in range(seq.start(), seq.end()) :
-                    lh.add(self._cases[0][ligne][i])
+        return self._choisirParmi('recherche', self._densite.meilleures())
 
-        for colonne, sbin in enumerate(self._binaires[1]) :
-            for seq in re.finditer('(?<!0)0{,'\
-                    + str(self._tailleMinimumBateau-1) + '}?(?!0)', sbin) :
-                for i in range(seq.start(), seq.end()) :
-                    lv.add(self._cases[1][colonne][i])
+    def _densiteActualiserTirages(self, *cases) :
+        ''' Méthode interne '''
+        ''' Retire les positionnements passant par les cases tirées '''
+        for n in cases :
+            self._densite.bloquer(n)
+        self._actualiserGeneriques(*cases)
+
+    def _densiteChoisirCasesExploitation(self) :
+        ''' Méthode interne '''
+        '''
+        Retourne une case parmi celles pouvant contenir le plus de
+        positionnements de bateaux passant par les cases touchées, ou 0 si
+        aucun positionnement n'est possible.
+        '''
+        touchees = 0
+        for case in self._exploitation :
+            touchees |= 1 << (case - 1)
+        compteur = self._densiteCompteur(touchees)
+        libres = ~self._masqueTirees & self._masqueGrille
+        meilleures = _maximumTranches(compteur, libres)
+        if not any(plan & meilleures for plan in compteur) :
+            self.decisions.enregistrer(self._tour, 'impasse',
+                                       self._exploitation, 0)
+            return 0
+        cases = self._casesMasque(meilleures)
+        return self._choisirParmi('exploitation', cases)
+
+    def _mcChoisirCasesExploitation(self) :
+        ''' Méthode interne '''
+        '''
+        Tire au hasard des dispositions complètes de la flotte restante
+        cohérentes avec les tirs effectués, et retourne la case non tirée la
+        plus souvent occupée.
+        Les tirages sont découpés en blocs de graines dérivées de celle du tour,
+        répartis sur les processus du pool, chacun s'arrêtant à l'échéance du
+        budget ; seuls les résultats reçus à temps sont fusionnés. Sans budget,
+        le résultat est identique quel que soit le nombre de processus.
+        Si une échéance a été fournie à tirer, des séries de blocs sont tirées
+        jusqu'à celle-ci.
+        '''
+        touchees = 0
+        for case in self._exploitation :
+            touchees |= 1 << (case - 1)
+        parametres = (self._nbCases, self._bateaux,
+                      tuple(self._taillesBateaux),
+                      self._masqueTirees & ~touchees, touchees,
+                      self._bateauxAdjacents,
+                      getattr(config, 'repertoireDonnees', None))
+        # Échéance fournie à tirer : tirages par séries jusqu'à celle-ci,
+        # sinon une seule série limitée par le budget
+        echeance = self._echeance
+        if echeance is None and self._budget is not None :
+            echeance = time() + self._budget
+        # Les blocs et leurs graines ne dépendent pas du nombre de processus
+        graine = self._hasard.getrandbits(64)
+        nombre = -(-self._echantillons // self._blocs)
+        comptes = [0] * (self._nbCases ** 2 + 1)
+        total = 0
+        serie = 0
+        while True :
+            blocs = [parametres + (deriverGraine(graine, serie, i), nombre,
+                                   echeance) for i in range(self._blocs)]
+            if self._processus :
+                pool = obtenirPool('ia', self._processus)
+                resultats = [pool.apply_async(echantillonnerFlottes, bloc)\
+                             for bloc in blocs]
+                for resultat in resultats :
+                    try :
+                        if echeance is None :
+                            c, n = resultat.get()
+                        else :
+                            c, n = resultat.get(max(0, echeance - time())\
+                                                + 0.05)
+                    except multiprocessing.TimeoutError :
+                        continue
+                    comptes = [a + b for a, b in zip(comptes, c)]
+                    total += n
+            else :
+                for bloc in blocs :
+                    c, n = echantillonnerFlottes(*bloc)
+                    comptes = [a + b for a, b in zip(comptes, c)]
+                    total += n
+            serie += 1
+            if self._echeance is None or time() >= echeance :
+                break
+        self.decisions.enregistrer(self._tour, 'echantillons', (), total)
+        if not total :
+            return self._densiteChoisirCasesExploitation()
+        libres = [n for n in range(1, self._nbCases ** 2 + 1)\
+                  if not self._estTiree(n)]
+        maximum = max(comptes[n] for n in libres)
+        cases = [n for n in libres if comptes[n] == maximum]
+        return self._choisirParmi('exploitation', cases)
+
+    def _exclureSequencesBinaires(self) :
+        ''' Méthode interne '''
+        '''
+        Exclut des tirages toutes les cases appartenant à des séquences de cases
+        non tirées inférieures à tailleMinimumBateau, à la fois sur leur ligne
+        et sur leur colonne.
+        '''
+        # Cases des séquences trop petites, horizontales et verticales
+        courtes = [0, 0]
+        for taille, segments in self._seauxSegments.items() :
+            if taille >= self._tailleMinimumBateau :
+                continue
+            for axe, ligne, debut in segments :
+                courtes[axe] |= self._masqueSegment(axe, ligne, debut,
+                                                    debut + taille)
 
         # Cases ne pouvant être occupées par un bateau
-        self._actualiserTirages(*list(lh & lv))
+        self._actualiserTirages(*self._casesMasque(courtes[0] & courtes[1]))
 
     def _binTirerCase(self) :
         ''' Méthode interne '''
         '''
         Tirage sur appui binaire
         '''
-        def adj(case) :
-            # Fonction déterminant si la case fournie en paramètre est adjacente
-            # à une case déjà tirée.
-            bg, bd = bornesGrille(case, self._nbCases)
-            ca = set()
-            if case - 1 >= bg :
-                ca.add(case-1)
-            if case + 1 <= bd :
-                ca.add(case+1)
-            if case - self._nbCases > 0 :
-                ca.add(case-self._nbCases)
-            if case + self._nbCases < self._nbCases ** 2 :
-                ca.add(case+self._nbCases)
-            return bool(ca & self._casesTirees)
-
+        # Cases adjacentes à une case déjà tirée
+        voisines = self._voisinesMasque(self._masqueTirees)
 
         # Explication des opérations effectuées dans la boucle
         # tmb = tailleMinimumBateau
@@ -580,65 +1870,30 @@ class IA :
         # on exclut tmb-1 premiers et derniers carac., on ne gardera donc que
         # les index de 3 à 5 inclus
 
-        # listes de set contenant les priorités sur les tirages à faire
-        lh = {'th':set(), 'h':set(), 'b':set(), 'tb':set()}
-        lv = {'th':set(), 'h':set(), 'b':set(), 'tb':set()}
-
-        for ligne, sbin in enumerate(self._binaires[0]) :
-            for seq in re.finditer('0{'\
-                        + str(self._tailleMinimumBateau) + ',}', sbin) :
-                ts = len(seq.group(0))
-                if ts < self._tailleMinimumBateau * 2 :
-                    ph = False
-                    indDeb = seq.start(0) + (ts - self._tailleMinimumBateau)
-                    indFin = seq.end(0) - (ts - self._tailleMinimumBateau)
-                else :
-                    ph = True
-                    indDeb = seq.start(0) + self._tailleMinimumBateau - 1
-                    indFin = seq.end(0) - self._tailleMinimumBateau + 1
-
-                while indDeb < indFin :
-                    if ph :
-                        if not adj(self._cases[0][ligne][indDeb]) :
-                            lh['th'].add(self._cases[0][ligne][indDeb])
-                        else :
-                            lh['h'].add(self._cases[0][ligne][indDeb])
-                    else :
-                        if not adj(self._cases[0][ligne][indDeb]) :
-                            lh['b'].add(self._cases[0][ligne][indDeb])
-                        else :
-                            lh['tb'].add(self._cases[0][ligne][indDeb])
-                    indDeb += 1
-
-
-        for colonne, sbin in enumerate(self._binaires[1]) :
-            for seq in re.finditer('0{'\
-                        + str(self._tailleMinimumBateau) + ',}', sbin) :
-                ts = len(seq.group(0))
-                if ts < self._tailleMinimumBateau * 2 :
-                    ph = False
-                    indDeb = seq.start(0) + (ts - self._tailleMinimumBateau)
-                    indFin = seq.end(0) - (ts - self._tailleMinimumBateau)
+        # masques des priorités sur les tirages à faire (horizontal, vertical)
+        lh = {'th':0, 'h':0, 'b':0, 'tb':0}
+        lv = {'th':0, 'h':0, 'b':0, 'tb':0}
+
+        tmb = self._tailleMinimumBateau
+        for ts, segments in self._seauxSegments.items() :
+            if ts < tmb :
+                continue
+            for axe, ligne, debut in segments :
+                priorites = (lh, lv)[axe]
+                if ts < tmb * 2 :
+                    masque = self._masqueSegment(axe, ligne,
+                                                 debut + ts - tmb,
+                                                 debut + tmb)
+                    priorites['b'] |= masque & ~voisines
+                    priorites['tb'] |= masque & voisines
                 else :
-                    ph = True
-                    indDeb = seq.start(0) + self._tailleMinimumBateau - 1
-                    indFin = seq.end(0) - self._tailleMinimumBateau + 1
-
-                while indDeb < indFin :
-                    if ph :
-                        if not adj(self._cases[1][colonne][indDeb]) :
-                            lv['th'].add(self._cases[1][colonne][indDeb])
-                        else :
-                            lv['h'].add(self._cases[1][colonne][indDeb])
-                    else :
-                        if not adj(self._cases[1][colonne][indDeb]) :
-                            lv['b'].add(self._cases[1][colonne][indDeb])
-                        else :
-                            lv['tb'].add(self._cases[1][colonne][indDeb])
-                    indDeb += 1
+                    masque = self._masqueSegment(axe, ligne,
+                                                 debut + tmb - 1,
+                                                 debut + ts - tmb + 1)
+                    priorites['th'] |= masque & ~voisines
+                    priorites['h'] |= masque & voisines
 
-        n = 0
-        choix = None
+        choix = 0
         for priorite in ('th', 'h', 'b', 'tb') :
             if lh[priorite] and lv[priorite] :
                 choix = lh[priorite] & lv[priorite]
@@ -650,52 +1905,255 @@ class IA :
                 break
 
         # Sélection en priorité des cases étant présentes dans le tirage de base
-        intersectionTirages = choix & set(self._tirages)
+        intersectionTirages = choix & self._masqueTirages
         if intersectionTirages :
-            case = choice(list(intersectionTirages))
+            cases = self._casesMasque(intersectionTirages)
         else :
-            case = choice(list(choix))
-        return case
+            cases = self._casesMasque(choix)
+        return self._choisirParmi('recherche', cases)
 
-    def _binActualiserTirages(self, *cases) :
-        ''' Méthode interne '''
-        self._actualiserBinaires(*cases)
-        self._actualiserGeneriques(*cases)
+    def _zcInitialiser(self) :
+        ''' Méthode Interne '''
+        ''' Construction des zones de la grille et de leurs ratios '''
+        # Listes des numéros de case de chaque zone contenus dans les tirages.
+        # Et par soucis de facilité/perfs, création d'une seconde liste
+        # indiquant le ratio taille/contenance qui sera recalculé losqu'une de
+        # ces cases sera tirée (supprimée)
+        self._zonesCases = []
+        self._zonesCasesRatio = []
+        for cases, taille in self._donnees.zones :
+            zone = [c for c in cases if self._masqueTirages >> (c - 1) & 1]
+            self._zonesCases.append(zone)
+            self._zonesCasesRatio.append({'taille':taille,
+                                          'nombre':len(zone),
+                                          'ratio':len(zone) / taille})
+
+        # Index case -> zone la contenant, et seaux des index de zones par
+        # ratio, les ratios présents étant dans un tas (ratios opposés) dont les
+        # entrées des seaux vidés sont écartées lors de la consultation.
+        self._zoneCase = {}
+        for index, cases in enumerate(self._zonesCases) :
+            for case in cases :
+                self._zoneCase[case] = index
+        self._zonesSeaux = {}
+        self._zonesTas = []
+        for index, ratio in enumerate(self._zonesCasesRatio) :
+            self._zcAjouterSeau(index, ratio['ratio'])
+
+    def _zcAjouterSeau(self, index, ratio) :
+        ''' Méthode Interne '''
+        ''' Ajoute l'index de zone fourni au seau de son ratio '''
+        if ratio not in self._zonesSeaux :
+            self._zonesSeaux[ratio] = set()
+            heappush(self._zonesTas, -ratio)
+        self._zonesSeaux[ratio].add(index)
 
     def _zcIndexHautRatios(self) :
         ''' Méthode Interne '''
         ''' Retourne les index des zones ayant le plus gros ratio '''
-        ratioMax = max(self._zonesCasesRatio, key=itemgetter('ratio'))['ratio']
-        return [c for c, v in enumerate(self._zonesCasesRatio)\
-                if v['ratio'] == ratioMax]
+        while -self._zonesTas[0] not in self._zonesSeaux :
+            heappop(self._zonesTas)
+        return sorted(self._zonesSeaux[-self._zonesTas[0]])
 
     def _zcActualiserRatios(self, *index) :
         ''' Méthode Interne '''
         ''' Met à jour les ratios des zones des index fournis '''
-        for k in index :
+        for k in set(index) :
+            seau = self._zonesSeaux[self._zonesCasesRatio[k]['ratio']]
+            seau.discard(k)
+            if not seau :
+                del(self._zonesSeaux[self._zonesCasesRatio[k]['ratio']])
             self._zonesCasesRatio[k]['nombre'] = len(self._zonesCases[k])
             self._zonesCasesRatio[k]['ratio'] =\
                                         self._zonesCasesRatio[k]['nombre']\
                                         / self._zonesCasesRatio[k]['taille']
+            self._zcAjouterSeau(k, self._zonesCasesRatio[k]['ratio'])
 
     def _zcActualiserTirages(self, *cases) :
         ''' Méthode interne '''
         ''' Suppression des cases indiquées des zones '''
         index = []
-        for c, v in enumerate(self._zonesCases) :
-            for n in cases :
-                try :
-                    v.remove(n)
-                except ValueError :
-                    continue
-                index.append(c)
+        for n in cases :
+            k = self._zoneCase.pop(n, None)
+            if k is not None :
+                self._zonesCases[k].remove(n)
+                index.append(k)
         self._zcActualiserRatios(*index)
         self._actualiserGeneriques(*cases)
 
     def _zcTirerCase(self) :
         ''' Méthode Interne '''
         ''' Retourne une case parmi les zones ayant le plus gros ratio '''
-        return choice(self._zonesCases[choice(self._zcIndexHautRatios())])
+        zone = self._zonesCases[self._hasard.choice(
+                                                self._zcIndexHautRatios())]
+        return self._choisirParmi('recherche', zone)
+
+
+
+class BatchIA :
+    '''
+    Ia jouant simultanément un lot de parties indépendantes sur des grilles de
+    même taille et de même flotte, destinée aux simulations.
+    Stratégie « densite » : tir sur la case non tirée par laquelle passent le
+    plus de positionnements des bateaux restants, en ne comptant, pour les
+    parties ayant des cases touchées non coulées, que les positionnements
+    passant par celles-ci (autant de fois qu'ils en contiennent).
+
+    L'état est « tranché » par partie : pour chaque case, un entier dont le
+    bit g concerne la partie g. Chaque opération binaire traite ainsi toutes
+    les parties à la fois, et le coût d'un tour ne dépend que très peu du
+    nombre de parties.
+    '''
+    def __init__(self, nbCases, bateaux, nombre, bateauxAdjacents=False,
+                 hasard=None) :
+        '''
+        @param nbCases          : nombre de cases du côté de la grille
+        @param bateaux          : liste des tailles de bateaux
+        @param nombre           : nombre de parties du lot
+        @param bateauxAdjacents : si False, deux bateaux ne peuvent se toucher
+        @param hasard           : générateur aléatoire ou graine (voir
+                                  libs.obtenirHasard)
+        '''
+        self._nbCases = nbCases
+        self._bateauxAdjacents = bateauxAdjacents
+        self.nombre = nombre
+        # Générateur propre à chaque partie pour départager ses cases à
+        # égalité : les tirs d'une partie ne dépendent pas des autres parties
+        graine = obtenirHasard(hasard).getrandbits(64)
+        self._hasards = [Random(deriverGraine(graine, g))\
+                         for g in range(nombre)]
+        self._topologie = topologieGrille(nbCases)
+        tous = (1 << nombre) - 1
+        self._enCours = tous
+        # Pour chaque case (index 0 inutilisé), parties où elle n'a pas été
+        # tirée, et parties où elle est touchée sans que son bateau soit coulé
+        self._libres = [tous] * (nbCases ** 2 + 1)
+        self._actives = [0] * (nbCases ** 2 + 1)
+        # Pour chaque taille, parties ayant au moins 1, 2... bateaux restants
+        self._restants = {}
+        for taille in set(bateaux) :
+            self._restants[taille] = [tous] * bateaux.count(taille)
+        tables = tablesPlacements(nbCases, bateaux)
+        self._fenetres = {}
+        for taille in self._restants :
+            self._fenetres[taille] = [tuple(casesMasque(masque))\
+                                      for masque in tables.masques(taille)]
+        self._choix = {}
+
+    def _lot(self, parties) :
+        ''' Méthode interne '''
+        ''' Retourne le masque des parties d'index fournis '''
+        octets = bytearray((self.nombre + 7) // 8)
+        for g in parties :
+            octets[g >> 3] |= 1 << (g & 7)
+        return int.from_bytes(octets, 'little')
+
+    def _parties(self, masque) :
+        ''' Méthode interne '''
+        ''' Générateur des index des parties du masque fourni '''
+        bits = bin(masque)[:1:-1]
+        g = bits.find('1')
+        while g != -1 :
+            yield g
+            g = bits.find('1', g + 1)
+
+    def tirer(self) :
+        '''
+        Retourne la liste des cases tirées dans chaque partie du lot, 0 pour
+        les parties terminées.
+        '''
+        enCours = self._enCours
+        cible = 0
+        permises = [0] * len(self._libres)
+        for case in range(1, len(self._libres)) :
+            cible |= self._actives[case]
+            permises[case] = self._libres[case] | self._actives[case]
+
+        compteurs = [[] for _ in self._libres]
+        for taille, seuils in self._restants.items() :
+            if not seuils[0] & enCours :
+                continue
+            for fenetre in self._fenetres[taille] :
+                valide = enCours
+                for case in fenetre :
+                    valide &= permises[case]
+                    if not valide :
+                        break
+                if not valide :
+                    continue
+                # Poids du positionnement : nombre de cases touchées couvertes
+                # pour les parties en exploitation, 1 pour les autres
+                poids = [valide & ~cible]
+                for case in fenetre :
+                    if self._actives[case] & valide :
+                        _ajouterTranches(poids, [self._actives[case] & valide])
+                total = []
+                for seuil in seuils :
+                    _ajouterTranches(total, [p & seuil for p in poids])
+                for case in fenetre :
+                    _ajouterTranches(compteurs[case], total)
+
+        # Maximum par partie parmi les cases non tirées, plan par plan
+        candidats = [libres & enCours for libres in self._libres]
+        candidats[0] = 0
+        plan = max(len(compteur) for compteur in compteurs) - 1
+        while plan >= 0 :
+            presents = 0
+            for case, compteur in enumerate(compteurs) :
+                if plan < len(compteur) :
+                    presents |= candidats[case] & compteur[plan]
+            if presents :
+                for case, compteur in enumerate(compteurs) :
+                    if plan < len(compteur) :
+                        candidats[case] &= compteur[plan] | ~presents
+                    else :
+                        candidats[case] &= ~presents
+            plan -= 1
+
+        # Départage des cases à égalité de chaque partie par son générateur
+        egalites = [[] for _ in range(self.nombre)]
+        for case in range(1, len(candidats)) :
+            for g in self._parties(candidats[case]) :
+                egalites[g].append(case)
+        cases = [0] * self.nombre
+        self._choix = {}
+        for g in self._parties(enCours) :
+            if egalites[g] :
+                case = self._hasards[g].choice(egalites[g])
+                cases[g] = case
+                self._choix[case] = self._choix.get(case, 0) | 1 << g
+        return cases
+
+    def resultats(self, resultats) :
+        '''
+        Prend en compte les résultats des tirs du dernier appel à tirer.
+        @param resultats : liste, pour chaque partie du lot, d'un tuple
+                           (résultat, cases du bateau coulé) où résultat vaut
+                           0 manqué, 1 touché, 2 coulé, 3 flotte coulée, ou
+                           None pour une partie terminée
+        '''
+        touchees = self._lot(g for g, r in enumerate(resultats)\
+                             if r and r[0])
+        for case, choix in self._choix.items() :
+            self._libres[case] &= ~choix
+            self._actives[case] |= choix & touchees
+        for g, resultat in enumerate(resultats) :
+            if not resultat or resultat[0] < 2 :
+                continue
+            bit = 1 << g
+            cases = resultat[1]
+            for case in cases :
+                self._actives[case] &= ~bit
+            if not self._bateauxAdjacents :
+                for case in self._topologie.adjacentes(*cases) :
+                    self._libres[case] &= ~bit
+            seuils = self._restants[len(cases)]
+            for k in range(len(seuils)) :
+                suivant = seuils[k + 1] if k + 1 < len(seuils) else 0
+                seuils[k] = seuils[k] & ~bit | suivant & bit
+            if resultat[0] == 3 :
+                self._enCours &= ~bit
+        self._choix = {}
 
 
 
@@ -730,3 +2188,15 @@ if __name__ == '__main__' :
 
     #genererGrille(12, [4, 5, 6, 15, 27, 39, 105, 117, 129, 141])
 
+    # Construction du livre d'ouvertures d'une grille dans le répertoire des
+    # données du jeu :
+    #   python ia.py idJeu profondeur [a (bateaux juxtaposés)]
+    import sys
+    if len(sys.argv) > 2 :
+        livre = ecrireLivreOuvertures(sys.argv[1], sys.argv[3:4] == ['a'],
+                                      int(sys.argv[2]),
+                                      os.path.join(os.path.dirname(
+                                          os.path.abspath(__file__)),
+                                          'donnees'))
+        print(' '.join(map(str, livre.cases)))
+
@@ -8,7 +8,7 @@ from time import time as timestamp
 
 from composants import Fenetre, Boutons, Preferences, Scores, APropos, Frame
 import composants
-from disposition import DispositionManuelle, DispositionAleatoire
+from disposition import DispositionManuelle, reserveFlottes
 import controleur
 
 
@@ -78,6 +78,7 @@ class Jeu(Fenetre) :
         # Logs
         config.repertoireLogs = config.repertoireCourant + 'logs/'
         config.fichierLogIA = config.repertoireLogs + 'ia.log'
+        config.fichierDecisionsIA = config.repertoireLogs + 'decisions.log'
         # Non implémenté
         #config.fichierGrillesUtilisateur = config.repertoireDonnees + 'grilles'
 
@@ -138,6 +139,10 @@ class Jeu(Fenetre) :
                                 in config.idJeu[config.idJeu.find('b'):]\
                                 if n.isdigit()], reverse=True)
         config.nomsBateaux = libs.definirNomsBateaux()
+        # Flottes aléatoires (bouton hasard, flotte de l'ia) tirées dès à
+        # présent en arrière-plan
+        reserveFlottes(config.idJeu, config.nombreCases, config.bateaux,
+                       self.bateauxAdjacents)
         self.disposition = DispositionManuelle(self.plateau,
                                                self.bateauxAdjacents,
                                                self.bas)
@@ -153,12 +158,16 @@ class Jeu(Fenetre) :
         self.disposition.detruire()
         self.disposition = None
 
-        da = DispositionAleatoire(self.bateauxAdjacents)
-        bateauxAdverse = da.positionner()
+        self._bateauxJoueur = bateaux
+        bateauxAdverse = reserveFlottes(config.idJeu, config.nombreCases,
+                                        config.bateaux, self.bateauxAdjacents)\
+                         .prendre()
+        strategie = self.preferences['strategie']
         self._deroulement = controleur.ControleurJeu(self.plateau, bateaux,
                                                      bateauxAdverse,
                                                      self.bateauxAdjacents,
-                                                     self.resultatsPartie)
+                                                     self.resultatsPartie,
+                                                     strategie)
 
 
     def resultatsPartie(self, gagnant, nombreCoups, timestampDepart) :
@@ -173,6 +182,10 @@ class Jeu(Fenetre) :
         libs.enregistrerResultats(self.preferences['grille'], gagnant,
                                   timestampDepart, timestamp(), nombreCoups,
                                   self.bateauxAdjacents)
+        # Apprentissage de la disposition du joueur par l'ia
+        libs.carteFlottes(config.idJeu, config.nombreCases,
+                          self.bateauxAdjacents)\
+            .ajouterFlotte(self._bateauxJoueur.values())
         config.fenetreBas.vider()
         boutons = Boutons(self.bas)
 
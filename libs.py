@@ -2,20 +2,29 @@
 # -*-coding: utf-8 -*
 
 import xml.etree.ElementTree as xet
+import atexit
 import tkinter as tk
 import re
 import os
-from math import ceil
-from random import randint, randrange, sample, shuffle
-from collections import namedtuple
+import hashlib
+import mmap
+import struct
+from random import Random, randint, randrange, shuffle
+from collections import namedtuple, deque
 from copy import deepcopy
 from pickle import Pickler, Unpickler
 import logging
 import logging.config
+import queue
+import threading
+import multiprocessing
 
 import config
 
 class Journalisation :
+    # Fichier et sortie de la dernière configuration du logging
+    _configuration = None
+
     def __init__(self, fichier, terminal=False) :
         '''
         Journalisation de l'application.
@@ -23,31 +32,123 @@ class Journalisation :
         @param terminal : booléen, False par défaut, définit si le log doit être
                           également en sortie dans le terminal ou la console.
         '''
-        parametres = config.PARAMETRES_LOGGING
-        parametres['handlers']['fichier_debug']['filename'] = fichier
-        parametres['handlers']['fichier_info']['filename'] = fichier
+        if terminal :
+            loggers = (logging.getLogger('terminal.info'),
+                       logging.getLogger('terminal.debug'))
+        else :
+            loggers = (logging.getLogger('fichier.info'),
+                       logging.getLogger('fichier.debug'))
+        if Journalisation._configuration == (fichier, terminal) :
+            # Logging déjà configuré pour ce fichier, il est seulement vidé
+            for logger in loggers :
+                for handler in logger.handlers :
+                    if isinstance(handler, logging.FileHandler) :
+                        handler.flush()
+                        handler.stream.truncate(0)
+        else :
+            parametres = config.PARAMETRES_LOGGING
+            parametres['handlers']['fichier_debug']['filename'] = fichier
+            parametres['handlers']['fichier_info']['filename'] = fichier
+            try :
+                os.remove(fichier)
+            except :
+                pass
+            logging.config.dictConfig(parametres)
+            Journalisation._configuration = (fichier, terminal)
+        self.info = loggers[0].info
+        self.debug = loggers[1].debug
+
+
+class JournalDecisions :
+    '''
+    Journal compact des décisions de l'ia : chaque décision est un tuple
+    (tour, phase, candidats, choix) ajouté à un tampon circulaire en mémoire.
+    Le tampon est transmis à un thread d'écriture lorsqu'il est plein, ou sur
+    demande (fin de partie, erreur), afin que l'écriture dans le fichier ne
+    ralentisse pas les tours de l'ia.
+    '''
+    def __init__(self, fichier, capacite=4096) :
+        '''
+        @param fichier  : fichier où les décisions doivent être enregistrées.
+        @param capacite : nombre de décisions conservées en mémoire avant leur
+                          transmission au thread d'écriture.
+        '''
+        self.fichier = fichier
+        self._tampon = deque(maxlen=capacite)
+        self._lots = queue.Queue()
+        self._ecrivain = None
         try :
             os.remove(fichier)
         except :
             pass
-        logging.config.dictConfig(parametres)
-        if terminal :
-            self.info = logging.getLogger('terminal.info').info
-            self.debug = logging.getLogger('terminal.debug').debug
-        else :
-            self.info = logging.getLogger('fichier.info').info
-            self.debug = logging.getLogger('fichier.debug').debug
+
+    def enregistrer(self, tour, phase, candidats, choix) :
+        '''
+        Ajoute une décision au tampon.
+        @param tour      : numéro du tour de l'ia
+        @param phase     : phase de jeu (« recherche », « exploitation », etc.),
+                           retour de tir (« touchee », « suppression »,
+                           « coule ») ou information sur le calcul d'un tir
+                           (« echantillons » : dispositions tirées par la
+                           stratégie montecarlo, « impasse » : aucun
+                           positionnement ne passe par les cases touchées)
+        @param candidats : cases candidates, cases du retour de tir, ou cases
+                           touchées pour « impasse »
+        @param choix     : case choisie, nombre de dispositions tirées pour
+                           « echantillons », 0 sinon
+        '''
+        self._tampon.append((tour, phase, tuple(candidats), choix))
+        if len(self._tampon) == self._tampon.maxlen :
+            self.vider()
+
+    def vider(self) :
+        ''' Transmet le contenu du tampon au thread d'écriture '''
+        if not self._tampon :
+            return
+        if self._ecrivain is None :
+            self._ecrivain = threading.Thread(target=self._ecrire, daemon=True)
+            self._ecrivain.start()
+        self._lots.put(list(self._tampon))
+        self._tampon.clear()
+
+    def fermer(self) :
+        '''
+        Vide le tampon et attend la fin de l'écriture de toutes les décisions.
+        '''
+        self.vider()
+        if self._ecrivain is not None :
+            self._lots.put(None)
+            self._ecrivain.join()
+            self._ecrivain = None
+
+    def _ecrire(self) :
+        ''' Méthode interne '''
+        ''' Boucle du thread d'écriture des lots de décisions '''
+        while True :
+            lot = self._lots.get()
+            if lot is None :
+                break
+            try :
+                with open(self.fichier, 'a') as f :
+                    for tour, phase, candidats, choix in lot :
+                        f.write('{}\t{}\t{}\t{}\n'\
+                                .format(tour, phase, choix,
+                                        ' '.join(map(str, candidats))))
+            except OSError :
+                continue
 
 
-def definirNomsBateaux() :
+def definirNomsBateaux(hasard=None) :
     '''
     Retourne une liste contenant l'identifiant dans langue en relation avec la
     liste des bateaux définis dans config.bateaux
+    @param hasard : générateur aléatoire ou graine (voir obtenirHasard)
     '''
+    hasard = obtenirHasard(hasard)
     liste = {}
-    for tb in set(config.bateaux) :
-        liste[tb] = sample(range(len(config.langue.bateaux[tb])),
-                           config.bateaux.count(tb))
+    for tb in sorted(set(config.bateaux)) :
+        liste[tb] = hasard.sample(range(len(config.langue.bateaux[tb])),
+                                  config.bateaux.count(tb))
     nomsBateaux = []
     for index, tb in enumerate(config.bateaux) :
         nomsBateaux.append('bateaux[{}][{}]'.format(tb, liste[tb].pop()))
@@ -90,21 +191,28 @@ PREFS = {'grille':'standard',
          'langue':'fr',
          'methode':'souris',
          #'son':'sans', # => abandonné
-         'adjacent':False}
+         'adjacent':False,
+         'strategie':'zones'}
 
 def chargerPreferences() :
     if os.path.isfile(config.fichierPreferences) :
         #XXX Aucune vérif n'est faite sur le retour du fichier
         # A voir pour la gestion de données invalides
         prefs = chargerFichierSerialise(config.fichierPreferences)
+        # Préférences antérieures à l'ajout d'options : valeurs par défaut
+        manquantes = set(PREFS.keys()) - set(prefs.keys())
+        if manquantes :
+            for c in manquantes :
+                prefs[c] = PREFS[c]
+            enregistrerFichierSerialise(config.fichierPreferences, prefs)
     else :
-        prefs = PREFS
+        prefs = dict(PREFS)
         enregistrerFichierSerialise(config.fichierPreferences, prefs)
     return prefs
 
 
 def enregistrerPreferences(**valeurs) :
-    prefs = chargerFichierSerialise(config.fichierPreferences)
+    prefs = chargerPreferences()
     dif = set(valeurs.keys()) - set(prefs.keys())
     if dif :
         raise KeyError(', '.join(dif)\
@@ -261,7 +369,6 @@ def definirFamillesPolices(root=None) :
 
     return schema(**familles)
 
-#XXX Ne sert nulle part dans l'application
 def creerIdGrille(nbCases, bateaux) :
     '''
     Crée un identifiant grille de la forme gXbn.....bn
@@ -274,26 +381,157 @@ def creerIdGrille(nbCases, bateaux) :
                             in sorted(bateaux.items(), reverse=True) if nb]))
 
 
+class TopologieGrille :
+    '''
+    Topologie d'une grille carrée ne dépendant que de son nombre de cases de
+    côté, calculée une seule fois et partagée par tout le processus (voir
+    topologieGrille). Pour chaque case (index 0 inutilisé) :
+        - les bornes gauche et droite de sa ligne
+        - ses cases voisines (haut, bas, gauche, droite) et leur masque
+    ainsi que les masques de la grille, des lignes et des colonnes (bit
+    case - 1) et les fenêtres des positionnements de chaque taille de bateau.
+    Ces données ne doivent pas être modifiées.
+    '''
+    HORIZONTAL, VERTICAL = 0, 1
+
+    def __init__(self, nbCases) :
+        '''
+        @param nbCases : nombre de cases du côté de la grille
+        '''
+        self.nbCases = nbCases
+        n = nbCases
+        self.masqueGrille = (1 << n ** 2) - 1
+        self.masquesLignes = tuple(((1 << n) - 1) << (ligne * n)\
+                                   for ligne in range(n))
+        colonne = sum(1 << (ligne * n) for ligne in range(n))
+        self.masquesColonnes = tuple(colonne << c for c in range(n))
+        self.masqueSansColonneGauche = self.masqueGrille\
+                                       & ~self.masquesColonnes[0]
+        self.masqueSansColonneDroite = self.masqueGrille\
+                                       & ~self.masquesColonnes[-1]
+
+        bornes, voisines, masquesVoisines = [None], [()], [0]
+        for case in range(1, n ** 2 + 1) :
+            ligne, colonne = divmod(case - 1, n)
+            bornes.append((ligne * n + 1, ligne * n + n))
+            v = []
+            if ligne > 0 :
+                v.append(case - n)
+            if ligne < n - 1 :
+                v.append(case + n)
+            if colonne > 0 :
+                v.append(case - 1)
+            if colonne < n - 1 :
+                v.append(case + 1)
+            voisines.append(tuple(v))
+            masquesVoisines.append(sum(1 << (c - 1) for c in v))
+        self.bornes = tuple(bornes)
+        self.voisines = tuple(voisines)
+        self.masquesVoisines = tuple(masquesVoisines)
+        self._fenetres = {}
+
+    def voisinesMasque(self, masque) :
+        '''
+        Retourne le masque des cases voisines (haut, bas, gauche, droite) des
+        cases du masque fourni, celles-ci pouvant en faire partie.
+        '''
+        return ((masque << 1) & self.masqueSansColonneGauche\
+                | (masque >> 1) & self.masqueSansColonneDroite\
+                | masque << self.nbCases | masque >> self.nbCases)\
+                & self.masqueGrille
+
+    def adjacentes(self, *cases) :
+        '''
+        Retourne le tuple croissant des cases voisines des cases fournies, hors
+        de celles-ci.
+        '''
+        masque = 0
+        for c in cases :
+            masque |= 1 << (c - 1)
+        return tuple(casesMasque(self.voisinesMasque(masque) & ~masque))
+
+    def fenetres(self, taille) :
+        '''
+        Retourne le tuple des positionnements d'un bateau de la taille fournie,
+        sous forme de tuples (case de début * 2 + orientation, masque des cases,
+        masque des cases et de leurs voisines), calculé une seule fois par
+        taille. Un bateau d'une case n'a qu'un positionnement par case
+        (horizontal).
+        '''
+        if taille not in self._fenetres :
+            n = self.nbCases
+            fenetres = []
+            for case in range(1, n ** 2 + 1) :
+                ligne, colonne = divmod(case - 1, n)
+                for orientation, possible, pas in\
+                        ((self.HORIZONTAL, colonne + taille <= n, 1),
+                         (self.VERTICAL, ligne + taille <= n and taille > 1,
+                          n)) :
+                    if not possible :
+                        continue
+                    masque = 0
+                    for c in range(case, case + taille * pas, pas) :
+                        masque |= 1 << (c - 1)
+                    fenetres.append((case * 2 + orientation, masque,
+                                     masque | self.voisinesMasque(masque)))
+            self._fenetres[taille] = tuple(fenetres)
+        return self._fenetres[taille]
+
+
+_topologies = {}
+
+def topologieGrille(nbCases) :
+    '''
+    Retourne la TopologieGrille partagée de la grille fournie.
+    @param nbCases : nombre de cases du côté de la grille
+    '''
+    if nbCases not in _topologies :
+        _topologies[nbCases] = TopologieGrille(nbCases)
+    return _topologies[nbCases]
+
+
 def bornesGrille(case, nbCases) :
     '''
     Retourne les bornes gauche et droite de la grille selon le numéro de la case
     fournie en paramètre
     '''
-    bd = ceil(case / nbCases) * nbCases
-    bg = bd - nbCases + 1
-    return (bg, bd)
+    return topologieGrille(nbCases).bornes[case]
 
 
-def genChaine(longueur, cars=None) :
+def genChaine(longueur, cars=None, hasard=None) :
     '''
     Génère une chaine aléatoire
+    @param hasard : générateur aléatoire ou graine (voir obtenirHasard)
     '''
     if not cars :
         cars = 'AZERTYUIOPQSDFGHJKLMWXCVBN0123456789'
     if longueur > len(cars) :
         raise ValueError('longueur de chaine demandée trop conséquente')
+    hasard = obtenirHasard(hasard)
     while True :
-        yield ''.join(sample(cars, longueur))
+        yield ''.join(hasard.sample(cars, longueur))
+
+
+def obtenirHasard(hasard=None) :
+    '''
+    Retourne le générateur aléatoire fourni, ou un générateur initialisé avec
+    la graine fournie (entier), ou à défaut par le système.
+    '''
+    if isinstance(hasard, Random) :
+        return hasard
+    return Random(hasard)
+
+
+def deriverGraine(graine, *composantes) :
+    '''
+    Retourne une graine de 64 bits dérivée de la graine et des composantes
+    fournies (index de bloc, de partie, etc.), afin que chaque tâche d'un
+    calcul réparti ait son propre générateur, indépendamment du nombre et de
+    l'ordre des processus qui l'exécutent.
+    '''
+    empreinte = hashlib.blake2b(repr((graine,) + composantes).encode(),
+                                digest_size=8)
+    return int.from_bytes(empreinte.digest(), 'little')
 
 
 def genItemListe(liste) :
@@ -372,31 +610,18 @@ class CasesGrille :
         self.ligne = ligne
         self.nbCases = nbCases
         self.tailleCases = tailleCases
+        self.topologie = topologieGrille(nbCases)
 
         # Génération de toutes les cases, leurs coordonnées ainsi que leurs
-        # cases adjacentes
+        # cases adjacentes (partagées avec la topologie de la grille)
         self.cases = {}
         i = 1
         cx = self.x + self.ligne
         cy = self.y + self.ligne
         while i <= self.nbCases ** 2 :
-            adjacentes = []
-            # Borne haute
-            if i - self.nbCases > 0 :
-                adjacentes.append(i - self.nbCases)
-            # Borne Basse
-            if i + self.nbCases < self.nbCases ** 2 :
-                adjacentes.append(i + self.nbCases)
-            # Borne droite et gauche
-            bg, bd = bornesGrille(i, self.nbCases)
-            if i - 1 >= bg :
-                adjacentes.append(i - 1)
-            if i + 1 <= bd :
-                adjacentes.append(i + 1)
-
             self.cases[i] = {'coords':(cx, cy, cx+self.tailleCases,
                                        cy+self.tailleCases),
-                             'adjacentes':adjacentes}
+                             'adjacentes':self.topologie.voisines[i]}
             if i % nbCases == 0 :
                 cx = self.x + self.ligne
                 cy += self.tailleCases + self.ligne
@@ -457,6 +682,487 @@ class CasesGrille :
 
 
 
+class TablesPlacements :
+    '''
+    Tables des positionnements légaux de chaque taille de bateau d'une grille.
+    Pour chaque taille, chaque positionnement est décrit par :
+        - sa case de début (la plus en haut à gauche) et son orientation
+        - le masque de ses cases (bit case - 1), seul utile lorsque les bateaux
+          peuvent être juxtaposés
+        - le masque de ses cases et de leurs adjacentes, zone interdite aux
+          autres bateaux lorsqu'ils ne peuvent être juxtaposés
+
+    Les tables peuvent être enregistrées dans un fichier versionné, projeté en
+    mémoire (mmap) lors des chargements suivants.
+    Format du fichier (entiers petit-boutistes) :
+        - entête : signature, version, nombre de cases du côté, nombre de
+          tailles
+        - pour chaque taille : la taille et son nombre de positionnements
+        - pour chaque taille : les débuts (case * 2 + orientation) sur 2 octets,
+          puis les masques des cases, puis ceux des zones interdites, chacun sur
+          le nombre d'octets nécessaires aux cases de la grille.
+    '''
+    SIGNATURE = b'BNPL'
+    # Version 2 : un seul positionnement par case pour les bateaux d'une case
+    VERSION = 2
+    HORIZONTAL, VERTICAL = 0, 1
+
+    def __init__(self, nbCases, bateaux, fichier=None) :
+        '''
+        @param nbCases : nombre de cases du côté de la grille
+        @param bateaux : liste des tailles de bateaux
+        @param fichier : fichier de cache des tables, None pour ne les
+                         construire qu'en mémoire
+        '''
+        self.nbCases = nbCases
+        self.tailles = tuple(sorted(set(bateaux), reverse=True))
+        self._octets = (nbCases ** 2 + 7) // 8
+        self._decodages = {}
+        self._index = {}
+
+        donnees = None
+        if fichier :
+            donnees = self._charger(fichier)
+            if donnees is None :
+                try :
+                    os.makedirs(os.path.dirname(fichier), exist_ok=True)
+                    temporaire = fichier + '.tmp'
+                    with open(temporaire, 'wb') as f :
+                        f.write(self._generer())
+                    os.replace(temporaire, fichier)
+                except OSError :
+                    pass
+                else :
+                    donnees = self._charger(fichier)
+        if donnees is None :
+            donnees = self._generer()
+        self._donnees = donnees
+
+        # Positions des blocs de chaque taille dans les données
+        self._blocs = {}
+        position = struct.calcsize('<4sHHH')\
+                   + struct.calcsize('<HI') * len(self.tailles)
+        for i, taille in enumerate(self.tailles) :
+            _, nombre = struct.unpack_from('<HI', self._donnees,
+                                           struct.calcsize('<4sHHH')\
+                                           + struct.calcsize('<HI') * i)
+            self._blocs[taille] = (nombre, position)
+            position += nombre * (2 + self._octets * 2)
+
+    def _generer(self) :
+        ''' Méthode interne '''
+        ''' Énumère les positionnements et retourne les données binaires '''
+        entete = [struct.pack('<4sHHH', self.SIGNATURE, self.VERSION,
+                              self.nbCases, len(self.tailles))]
+        blocs = []
+        for taille in self.tailles :
+            debuts, masques, halos = zip(*topologieGrille(self.nbCases)\
+                                          .fenetres(taille))
+            entete.append(struct.pack('<HI', taille, len(debuts)))
+            blocs.append(struct.pack('<{}H'.format(len(debuts)), *debuts))
+            blocs.append(b''.join(m.to_bytes(self._octets, 'little')\
+                                  for m in masques))
+            blocs.append(b''.join(h.to_bytes(self._octets, 'little')\
+                                  for h in halos))
+        return b''.join(entete + blocs)
+
+    def _charger(self, fichier) :
+        ''' Méthode interne '''
+        '''
+        Projette en mémoire le fichier des tables, retourne None s'il n'existe
+        pas, ne correspond pas à la version ou à la grille, ou est tronqué.
+        '''
+        try :
+            with open(fichier, 'rb') as f :
+                donnees = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) :
+            return None
+        try :
+            signature, version, nbCases, nbTailles =\
+                                    struct.unpack_from('<4sHHH', donnees)
+            blocs = [struct.unpack_from('<HI', donnees,
+                                        struct.calcsize('<4sHHH')\
+                                        + struct.calcsize('<HI') * i)\
+                     for i in range(nbTailles)]
+        except struct.error :
+            donnees.close()
+            return None
+        tailles = tuple(taille for taille, _ in blocs)
+        # Taille attendue d'après le nombre de positionnements de chaque taille
+        longueur = struct.calcsize('<4sHHH')\
+                   + struct.calcsize('<HI') * nbTailles\
+                   + sum(nombre * (2 + self._octets * 2) for _, nombre in blocs)
+        if (signature, version, nbCases, tailles, len(donnees)) !=\
+           (self.SIGNATURE, self.VERSION, self.nbCases, self.tailles,
+            longueur) :
+            donnees.close()
+            return None
+        return donnees
+
+    def nombre(self, taille) :
+        ''' Retourne le nombre de positionnements d'une taille donnée '''
+        return self._blocs[taille][0]
+
+    def debut(self, taille, index) :
+        '''
+        Retourne le tuple (case de début, orientation) du positionnement d'index
+        fourni.
+        '''
+        return divmod(struct.unpack_from('<H', self._donnees,
+                                         self._blocs[taille][1]\
+                                         + index * 2)[0], 2)
+
+    def _masques(self, taille, decalage) :
+        ''' Méthode interne '''
+        ''' Décode (une seule fois) un bloc de masques d'une taille donnée '''
+        cle = (taille, decalage)
+        if cle not in self._decodages :
+            nombre, position = self._blocs[taille]
+            position += nombre * (2 + self._octets * decalage)
+            self._decodages[cle] = tuple(
+                int.from_bytes(self._donnees[p:p+self._octets], 'little')\
+                for p in range(position, position + nombre * self._octets,
+                               self._octets))
+        return self._decodages[cle]
+
+    def masques(self, taille) :
+        ''' Retourne les masques des cases des positionnements d'une taille '''
+        return self._masques(taille, 0)
+
+    def halos(self, taille) :
+        '''
+        Retourne les masques des cases et des adjacentes des positionnements
+        d'une taille donnée.
+        '''
+        return self._masques(taille, 1)
+
+    def index(self, case, orientation, taille) :
+        '''
+        Retourne l'index du positionnement d'une taille donnée débutant à la
+        case et selon l'orientation fournies, ou None s'il sort de la grille.
+        '''
+        if taille not in self._index :
+            nombre, position = self._blocs[taille]
+            debuts = struct.unpack_from('<{}H'.format(nombre), self._donnees,
+                                        position)
+            self._index[taille] = dict((d, i) for i, d in enumerate(debuts))
+        return self._index[taille].get(case * 2 + orientation)
+
+
+
+_tablesPlacements = {}
+
+def tablesPlacements(nbCases, bateaux, repertoire=None) :
+    '''
+    Retourne les tables des positionnements de la grille fournie, partagées par
+    tout le processus.
+    Les tables sont mises en cache dans le sous-répertoire « placements » du
+    répertoire fourni, ou à défaut de celui des données du jeu s'il est défini.
+    @param nbCases    : nombre de cases du côté de la grille
+    @param bateaux    : liste des tailles de bateaux
+    @param repertoire : répertoire des données
+    '''
+    idGrille = creerIdGrille(nbCases, dict((t, bateaux.count(t))\
+                                           for t in set(bateaux)))
+    if idGrille not in _tablesPlacements :
+        if repertoire is None :
+            repertoire = getattr(config, 'repertoireDonnees', None)
+        fichier = None
+        if repertoire :
+            fichier = os.path.join(repertoire, 'placements', '{}.v{}'\
+                                   .format(idGrille, TablesPlacements.VERSION))
+        _tablesPlacements[idGrille] = TablesPlacements(nbCases, bateaux,
+                                                       fichier)
+    return _tablesPlacements[idGrille]
+
+
+class CarteFlottes :
+    '''
+    Carte des positions des flottes adverses (celles du joueur humain) des
+    parties terminées d'une grille : pour chaque case et chaque orientation
+    (horizontale, verticale), le nombre de bateaux l'ayant occupée.
+    La carte est enregistrée dans un fichier projeté en mémoire (mmap), son
+    chargement se limite ainsi à une lecture et chaque partie ne met à jour
+    que les compteurs des cases de ses bateaux.
+    Format du fichier (entiers petit-boutistes) :
+        - entête : signature, version, nombre de cases du côté, nombre de
+          parties enregistrées
+        - compteurs sur 4 octets, d'index (case - 1) * 2 + orientation
+    '''
+    SIGNATURE = b'BNCT'
+    VERSION = 1
+    ENTETE = '<4sHHI'
+    HORIZONTAL, VERTICAL = 0, 1
+
+    def __init__(self, nbCases, fichier=None) :
+        '''
+        @param nbCases : nombre de cases du côté de la grille
+        @param fichier : fichier de la carte, None pour une carte en mémoire
+        '''
+        self.nbCases = nbCases
+        taille = struct.calcsize(self.ENTETE) + nbCases ** 2 * 2 * 4
+        self._donnees = None
+        if fichier :
+            try :
+                self._donnees = self._projeter(fichier, taille)
+            except (OSError, ValueError) :
+                self._donnees = None
+        if self._donnees is None :
+            self._donnees = bytearray(taille)
+            struct.pack_into(self.ENTETE, self._donnees, 0, self.SIGNATURE,
+                             self.VERSION, nbCases, 0)
+        # Compteurs lus et écrits en petit-boutiste quel que soit l'hôte, le
+        # fichier restant ainsi portable
+        self._debut = struct.calcsize(self.ENTETE)
+        self._format = '<{}I'.format(nbCases ** 2 * 2)
+
+    def _projeter(self, fichier, taille) :
+        ''' Méthode interne '''
+        '''
+        Projette en mémoire le fichier de la carte, le (re)créant vide s'il
+        n'existe pas ou ne correspond pas à la version ou à la grille.
+        '''
+        valide = False
+        if os.path.isfile(fichier) and os.path.getsize(fichier) == taille :
+            with open(fichier, 'rb') as f :
+                signature, version, nbCases, _ =\
+                        struct.unpack(self.ENTETE,
+                                      f.read(struct.calcsize(self.ENTETE)))
+            valide = (signature, version, nbCases) ==\
+                     (self.SIGNATURE, self.VERSION, self.nbCases)
+        if not valide :
+            os.makedirs(os.path.dirname(fichier), exist_ok=True)
+            with open(fichier, 'wb') as f :
+                f.write(struct.pack(self.ENTETE, self.SIGNATURE, self.VERSION,
+                                    self.nbCases, 0))
+                f.write(bytes(taille - struct.calcsize(self.ENTETE)))
+        with open(fichier, 'r+b') as f :
+            return mmap.mmap(f.fileno(), 0)
+
+    @property
+    def parties(self) :
+        ''' Nombre de parties enregistrées dans la carte '''
+        return struct.unpack_from(self.ENTETE, self._donnees)[3]
+
+    def occupations(self, orientation=None) :
+        '''
+        Retourne la liste du nombre de bateaux ayant occupé chaque case (index
+        0 inutilisé), selon l'orientation fournie ou les deux.
+        '''
+        comptes = struct.unpack_from(self._format, self._donnees, self._debut)
+        if orientation is None :
+            return [0] + [comptes[i] + comptes[i + 1]\
+                          for i in range(0, len(comptes), 2)]
+        return [0] + list(comptes[orientation::2])
+
+    def ajouterFlotte(self, bateaux) :
+        '''
+        Ajoute à la carte la flotte d'une partie terminée.
+        @param bateaux : itérable des listes croissantes des cases de chaque
+                         bateau
+        '''
+        for cases in bateaux :
+            cases = sorted(cases)
+            orientation = self.HORIZONTAL
+            if len(cases) > 1 and cases[1] - cases[0] != 1 :
+                orientation = self.VERTICAL
+            for case in cases :
+                position = self._debut + ((case - 1) * 2 + orientation) * 4
+                compte, = struct.unpack_from('<I', self._donnees, position)
+                struct.pack_into('<I', self._donnees, position, compte + 1)
+        struct.pack_into(self.ENTETE, self._donnees, 0, self.SIGNATURE,
+                         self.VERSION, self.nbCases, self.parties + 1)
+        if isinstance(self._donnees, mmap.mmap) :
+            self._donnees.flush()
+
+
+
+_cartesFlottes = {}
+
+def carteFlottes(idJeu, nbCases, bateauxAdjacents, repertoire=None) :
+    '''
+    Retourne la carte des flottes adverses de la grille fournie, partagée par
+    tout le processus.
+    La carte est enregistrée dans le sous-répertoire « cartes » du répertoire
+    fourni, ou à défaut de celui des données du jeu s'il est défini.
+    @param idJeu            : identifiant de la grille (voir creerIdGrille)
+    @param nbCases          : nombre de cases du côté de la grille
+    @param bateauxAdjacents : juxtaposition des bateaux, chaque mode ayant sa
+                              propre carte
+    @param repertoire       : répertoire des données
+    '''
+    cle = (idJeu, bool(bateauxAdjacents))
+    if cle not in _cartesFlottes :
+        if repertoire is None :
+            repertoire = getattr(config, 'repertoireDonnees', None)
+        fichier = None
+        if repertoire :
+            fichier = os.path.join(repertoire, 'cartes', '{}{}.v{}'\
+                                   .format(idJeu, 'a' if bateauxAdjacents\
+                                           else '', CarteFlottes.VERSION))
+        _cartesFlottes[cle] = CarteFlottes(nbCases, fichier)
+    return _cartesFlottes[cle]
+
+
+
+class LivreOuvertures :
+    '''
+    Livre d'ouvertures d'une grille : suite des premiers tirs à effectuer tant
+    que les précédents ont été manqués, chaque tir étant retrouvé d'après le
+    masque des cases déjà tirées (bit case - 1).
+    Format du fichier (entiers petit-boutistes) :
+        - entête : signature, version, nombre de cases du côté, nombre de tirs
+        - cases des tirs sur 2 octets
+    '''
+    SIGNATURE = b'BNLV'
+    VERSION = 1
+    ENTETE = '<4sHHH'
+
+    def __init__(self, nbCases, cases=(), fichier=None) :
+        '''
+        @param nbCases : nombre de cases du côté de la grille
+        @param cases   : cases des tirs successifs
+        @param fichier : fichier du livre à charger à la place des cases
+                         fournies, le livre restant vide s'il n'existe pas ou ne
+                         correspond pas à la version ou à la grille
+        '''
+        self.nbCases = nbCases
+        if fichier :
+            cases = self._charger(fichier)
+        self.cases = tuple(cases)
+        self._suivantes = {}
+        masque = 0
+        for case in self.cases :
+            self._suivantes[masque] = case
+            masque |= 1 << (case - 1)
+
+    def _charger(self, fichier) :
+        ''' Méthode interne '''
+        ''' Retourne les cases des tirs du fichier, () s'il est invalide '''
+        try :
+            with open(fichier, 'rb') as f :
+                donnees = f.read()
+            signature, version, nbCases, nombre =\
+                                    struct.unpack_from(self.ENTETE, donnees)
+            cases = struct.unpack_from('<{}H'.format(nombre), donnees,
+                                       struct.calcsize(self.ENTETE))
+        except (OSError, struct.error) :
+            return ()
+        if (signature, version, nbCases) !=\
+           (self.SIGNATURE, self.VERSION, self.nbCases) :
+            return ()
+        return cases
+
+    def __len__(self) :
+        return len(self.cases)
+
+    def suivante(self, masque) :
+        '''
+        Retourne la case à tirer après les cases du masque fourni, ou None si
+        celles-ci ne correspondent pas aux premiers tirs du livre.
+        '''
+        return self._suivantes.get(masque)
+
+    def enregistrer(self, fichier) :
+        ''' Enregistre le livre dans le fichier fourni '''
+        os.makedirs(os.path.dirname(fichier), exist_ok=True)
+        temporaire = fichier + '.tmp'
+        with open(temporaire, 'wb') as f :
+            f.write(struct.pack(self.ENTETE, self.SIGNATURE, self.VERSION,
+                                self.nbCases, len(self.cases)))
+            f.write(struct.pack('<{}H'.format(len(self.cases)), *self.cases))
+        os.replace(temporaire, fichier)
+
+
+_livresOuvertures = {}
+
+def fichierLivreOuvertures(idJeu, bateauxAdjacents, repertoire=None) :
+    '''
+    Retourne le fichier du livre d'ouvertures de la grille fournie, enregistré
+    dans le sous-répertoire « ouvertures » du répertoire fourni, ou à défaut de
+    celui des données du jeu, None si aucun des deux n'est défini.
+    '''
+    if repertoire is None :
+        repertoire = getattr(config, 'repertoireDonnees', None)
+    if not repertoire :
+        return None
+    return os.path.join(repertoire, 'ouvertures', '{}{}.v{}'\
+                        .format(idJeu, 'a' if bateauxAdjacents else '',
+                                LivreOuvertures.VERSION))
+
+
+def livreOuvertures(idJeu, nbCases, bateauxAdjacents, repertoire=None) :
+    '''
+    Retourne le livre d'ouvertures de la grille fournie, chargé une seule fois
+    par processus, vide s'il n'a pas été construit (voir
+    ia.ecrireLivreOuvertures).
+    @param idJeu            : identifiant de la grille (voir creerIdGrille)
+    @param nbCases          : nombre de cases du côté de la grille
+    @param bateauxAdjacents : juxtaposition des bateaux, chaque mode ayant son
+                              propre livre
+    @param repertoire       : répertoire des données
+    '''
+    cle = (idJeu, bool(bateauxAdjacents))
+    if cle not in _livresOuvertures :
+        _livresOuvertures[cle] = LivreOuvertures(
+                                    nbCases,
+                                    fichier=fichierLivreOuvertures(
+                                        idJeu, bateauxAdjacents, repertoire))
+    return _livresOuvertures[cle]
+
+
+def casesMasque(masque) :
+    '''
+    Retourne la liste croissante des numéros de cases des bits à 1 du masque
+    fourni (bit case - 1).
+    '''
+    cases = []
+    while masque :
+        bit = masque & -masque
+        cases.append(bit.bit_length())
+        masque ^= bit
+    return cases
+
+
+# Pools de processus partagés, un par usage : nom -> (pool, nombre de processus)
+_pools = {}
+_verrouPools = threading.Lock()
+
+def obtenirPool(nom, processus=1) :
+    '''
+    Retourne le pool de processus partagé du nom fourni, en le (re)créant au
+    besoin avec le nombre de processus fourni.
+    Les processus sont démarrés par « spawn » afin de ne pas dupliquer l'état
+    tkinter et les threads du jeu.
+    @param nom       : usage du pool (« ia », « reserves »…), chaque usage
+                       ayant ses propres processus
+    @param processus : nombre de processus du pool
+    '''
+    with _verrouPools :
+        pool, nombre = _pools.get(nom, (None, 0))
+        if pool is None or nombre != processus :
+            if pool is not None :
+                pool.terminate()
+            pool = multiprocessing.get_context('spawn').Pool(processus)
+            _pools[nom] = (pool, processus)
+        return pool
+
+
+def fermerPools(*noms) :
+    '''
+    Termine les processus des pools partagés dont les noms sont fournis, ou de
+    tous les pools à défaut.
+    '''
+    with _verrouPools :
+        for nom in noms or list(_pools) :
+            pool = _pools.pop(nom, (None, 0))[0]
+            if pool is not None :
+                pool.terminate()
+
+atexit.register(fermerPools)
+
+
+
 class Annuaire :
     def __init__(self, identifiant, dico) :
         '''
@@ -3,7 +3,6 @@
 import tkinter as tk
 import re
 
-import libs
 import config
 
 class CiblePlateau :
@@ -202,6 +201,7 @@ class Fleches(MethodeJeu) :
         MethodeJeu.__init__(self, plateau, appel, cg)
 
         self._ciblePlateau = CiblePlateau(self.plateau, self.cg)
+        self._topologie = self.cg.topologie
         # 1ère case ciblée au départ
         self._case = int(config.nombreCases/2)\
                     + (int(config.nombreCases/2)-1)\
@@ -253,7 +253,7 @@ class Fleches(MethodeJeu) :
         self._ciblePlateau.deplacerCercle(self._case)
 
     def gauche(self) :
-        bg, bd = libs.bornesGrille(self._case, config.nombreCases)
+        bg, bd = self._topologie.bornes[self._case]
         if self._case - 1 < bg :
             self._case = bd
         else :
@@ -262,7 +262,7 @@ class Fleches(MethodeJeu) :
         self._ciblePlateau.deplacerCercle(self._case)
 
     def droite(self) :
-        bg, bd = libs.bornesGrille(self._case, config.nombreCases)
+        bg, bd = self._topologie.bornes[self._case]
         if self._case + 1 > bd :
             self._case = bg
         else :
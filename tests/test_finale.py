@@ -0,0 +1,63 @@
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ia
+from libs import tablesPlacements
+
+
+class TestFinale(unittest.TestCase) :
+
+    def test_enumeration_sans_doublon(self) :
+        # Grille 4x4, bateaux de 2 et 1 cases adjacents, case 1 touchée
+        tables = tablesPlacements(4, [2, 1], None)
+        dispositions = ia.enumererDispositions(tables, [2, 1], 0, 1, True,
+                                               1000)
+        self.assertEqual(len(dispositions), len(set(dispositions)))
+        attendues = set()
+        for m2, m1 in itertools.product(tables.masques(2), tables.masques(1)) :
+            if not m2 & m1 and (m2 | m1) & 1 and m2 & ~1 and m1 & ~1 :
+                attendues.add(tuple(sorted((m2, m1))))
+        self.assertEqual(set(dispositions), attendues)
+
+    def test_resolution_dispositions_identiques(self) :
+        self.assertEqual(ia.resoudreFinale(1, True, 0, ((1,), (1,))), (1, (1,)))
+
+    def test_resolution_bateaux_coules(self) :
+        table = {}
+        self.assertEqual(ia._esperanceFinale(0, ((), ()), table),
+                         (0, ()))
+
+    def test_resolution_flotte_complete(self) :
+        tables = tablesPlacements(4, [2, 1], None)
+        dispositions = ia.enumererDispositions(tables, [2, 1], 0, 1, False,
+                                               1000)
+        esperance, cases = ia.resoudreFinale(4, False, 1, dispositions)
+        self.assertGreaterEqual(esperance, 2)
+        self.assertTrue(cases)
+
+    def test_table_partagee(self) :
+        tables = tablesPlacements(4, [2, 1], None)
+        dispositions = ia.enumererDispositions(tables, [2, 1], 0, 1, False,
+                                               1000)
+        ia._tablesFinales.clear()
+        froid = ia.resoudreFinale(4, False, 1, dispositions)
+        self.assertEqual(ia.resoudreFinale(4, False, 1, dispositions), froid)
+        self.assertEqual(ia._esperanceFinale(1, dispositions, {}), froid)
+
+    def test_cases_sans_information(self) :
+        # Bateau de 3 cases connu et bateau de 1 case sur l'une de 2 cases :
+        # les cases du bateau connu sont tirées d'abord
+        connu = 0b111
+        dispositions = tuple(sorted(((connu, 1 << 8),
+                                     tuple(sorted((connu, 1 << 12))))))
+        esperance, cases = ia._esperanceFinale(0, dispositions, {})
+        self.assertEqual(cases, (1, 2, 3))
+        self.assertEqual(esperance, 4.5)
+
+
+if __name__ == '__main__' :
+    unittest.main()
@@ -0,0 +1,60 @@
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import disposition
+from libs import Journalisation
+
+
+class TestJournalisationDisposition(unittest.TestCase) :
+
+    def setUp(self) :
+        self.repertoire = tempfile.TemporaryDirectory()
+        self.fichier = os.path.join(self.repertoire.name, 'journal.log')
+        # Configuration du logging après la création du logger du module
+        Journalisation(fichier=self.fichier)
+
+    def tearDown(self) :
+        logging.shutdown()
+        Journalisation._configuration = None
+        self.repertoire.cleanup()
+
+    def contenu(self) :
+        for handler in logging.getLogger('disposition').handlers :
+            handler.flush()
+        with open(self.fichier, encoding='utf-8') as f :
+            return f.read()
+
+    def test_avertissement_repli(self) :
+        aleatoire = disposition.DispositionAleatoire(False, hasard=1,
+                                                     nbCases=5,
+                                                     bateaux=[5, 5, 5],
+                                                     maxEssais=1)
+        aleatoire.positionner()
+        self.assertFalse(aleatoire.equiprobable)
+        self.assertIn('Tirage uniforme abandonné après 1 essais',
+                      self.contenu())
+
+    def test_avertissement_reserve(self) :
+        def obtenirPool(nom, processus=1) :
+            raise OSError('pool indisponible')
+        obtenirPoolInitial = disposition.obtenirPool
+        disposition.obtenirPool = obtenirPool
+        try :
+            reserve = disposition.ReserveFlottes(5, [3, 2], False)
+            reserve._remplisseur.join(10)
+        finally :
+            disposition.obtenirPool = obtenirPoolInitial
+        self.assertIn('Remplissage de la réserve de flottes arrêté : pool'
+                      ' indisponible', self.contenu())
+        # Les flottes sont alors tirées à la demande
+        self.assertEqual(sorted(map(len, reserve.prendre().values())),
+                         [2, 3])
+
+
+if __name__ == '__main__' :
+    unittest.main()